@@ -1,37 +1,45 @@
 WITH top_officers AS (
     SELECT 
-        TRIM(ticket_currently_pending_with) AS officer,
+        officer_id,
         COUNT(DISTINCT grievance_id) AS pending_grievances
     FROM staging_grievance
     WHERE status = 'Pending'
-    GROUP BY TRIM(ticket_currently_pending_with)
+      -- report filters (bound parameters; NULL = no filter)
+      AND (CAST(:district AS TEXT) IS NULL
+           OR district_id = (SELECT district_id FROM dim_district WHERE district = :district))
+      AND (CAST(:department AS TEXT) IS NULL
+           OR department_id = (SELECT department_id FROM dim_department WHERE department = :department))
+      AND (CAST(:date_from AS TEXT) IS NULL OR date_of_complaint >= :date_from)
+      AND (CAST(:date_before AS TEXT) IS NULL OR date_of_complaint < :date_before)
+    GROUP BY officer_id
     ORDER BY COUNT(DISTINCT grievance_id) DESC
-    LIMIT 20
+    LIMIT :top_n
 )
 SELECT 
-    TRIM(sg.ticket_currently_pending_with) AS "User",
-    sg.new_category AS "Category",
+    o.officer AS "User",
+    c.category AS "Category",
     COUNT(DISTINCT sg.grievance_id) AS "Pending Grievances",
     MAX(t.pending_grievances) AS "Total Pending (All Categories)"
 FROM staging_grievance sg
 JOIN top_officers t
-    ON TRIM(sg.ticket_currently_pending_with) = t.officer
+    ON sg.officer_id = t.officer_id
+JOIN dim_officer o
+    ON o.officer_id = sg.officer_id
+LEFT JOIN dim_category c
+    ON c.category_id = sg.category_id
 WHERE sg.status = 'Pending'
+  AND (CAST(:district AS TEXT) IS NULL
+       OR sg.district_id = (SELECT district_id FROM dim_district WHERE district = :district))
+  AND (CAST(:department AS TEXT) IS NULL
+       OR sg.department_id = (SELECT department_id FROM dim_department WHERE department = :department))
+  AND (CAST(:date_from AS TEXT) IS NULL OR sg.date_of_complaint >= :date_from)
+  AND (CAST(:date_before AS TEXT) IS NULL OR sg.date_of_complaint < :date_before)
 GROUP BY 
-    TRIM(sg.ticket_currently_pending_with),
-    sg.new_category
+    sg.officer_id,
+    o.officer,
+    sg.category_id,
+    c.category
 ORDER BY 
     MAX(t.pending_grievances) DESC,
     "User",
     "Pending Grievances" DESC;
-
-
-
-
-
-
-
-
-
-
-
@@ -0,0 +1,24 @@
+-- Pending Summary report read from report_officer_pending and
+-- report_officer_category_pending (built by aggregates.build_aggregates).
+-- Same output as NodalAnalysisReport.sql without filters (only the top_n parameter applies).
+WITH top_officers AS (
+    SELECT 
+        officer_id,
+        officer,
+        pending_grievances
+    FROM report_officer_pending
+    ORDER BY pending_grievances DESC
+    LIMIT :top_n
+)
+SELECT 
+    t.officer AS "User",
+    c.new_category AS "Category",
+    c.pending_grievances AS "Pending Grievances",
+    t.pending_grievances AS "Total Pending (All Categories)"
+FROM report_officer_category_pending c
+JOIN top_officers t
+    ON c.officer_id = t.officer_id
+ORDER BY 
+    t.pending_grievances DESC,
+    "User",
+    "Pending Grievances" DESC;
@@ -0,0 +1,35 @@
+-- Nodal Officer report read from report_department_summary
+-- (built by aggregates.build_aggregates at the end of every normalization).
+-- Same output as NodalOfficersqlQueries.sql without filters.
+WITH combined AS (
+    SELECT 
+        new_department AS department_name,
+        total_tickets,
+        pending_tickets,
+        closed_tickets,
+        nodal_officer,
+        nodal_officer_pending_count,
+        0 AS sort_order
+    FROM report_department_summary
+
+    UNION ALL
+
+    SELECT 
+        'Grand Total' AS department_name,
+        CAST(SUM(total_tickets) AS INTEGER),
+        CAST(SUM(pending_tickets) AS INTEGER),
+        CAST(SUM(closed_tickets) AS INTEGER),
+        '—' AS nodal_officer,
+        CAST(SUM(nodal_officer_pending_count) AS INTEGER),
+        1 AS sort_order
+    FROM report_department_summary
+)
+SELECT 
+    department_name AS "Department Name",
+    total_tickets AS "Total Ticket",
+    pending_tickets AS "Pending Ticket",
+    closed_tickets AS "Closed Ticket",
+    nodal_officer AS "Pending With Nodal Officer",
+    nodal_officer_pending_count AS "Nodal Officer Pending Count"
+FROM combined
+ORDER BY sort_order, total_tickets DESC;
@@ -1,44 +1,55 @@
 WITH base AS (
     SELECT 
-        new_department,
+        department_id,
         grievance_id,
         status,
-        ticket_currently_pending_with
+        officer_id
     FROM staging_grievance
+    -- report filters (bound parameters; NULL = no filter)
+    WHERE (CAST(:district AS TEXT) IS NULL
+           OR district_id = (SELECT district_id FROM dim_district WHERE district = :district))
+      AND (CAST(:department AS TEXT) IS NULL
+           OR department_id = (SELECT department_id FROM dim_department WHERE department = :department))
+      AND (CAST(:date_from AS TEXT) IS NULL OR date_of_complaint >= :date_from)
+      AND (CAST(:date_before AS TEXT) IS NULL OR date_of_complaint < :date_before)
 ),
 summary AS (
     SELECT 
-        new_department,
+        department_id,
         COUNT(DISTINCT grievance_id)::int AS total_tickets,
         COUNT(DISTINCT CASE WHEN status = 'Pending' THEN grievance_id END)::int AS pending_tickets,
         COUNT(DISTINCT CASE WHEN status = 'Closed' THEN grievance_id END)::int AS closed_tickets
     FROM base
-    GROUP BY new_department
+    GROUP BY department_id
 ),
 officer_rank AS (
     SELECT 
-        new_department,
-        ticket_currently_pending_with AS nodal_officer,
+        department_id,
+        officer_id,
         COUNT(DISTINCT grievance_id)::int AS officer_pending,
         ROW_NUMBER() OVER (
-            PARTITION BY new_department 
+            PARTITION BY department_id 
             ORDER BY COUNT(DISTINCT grievance_id) DESC
         ) AS rn
     FROM base
     WHERE status = 'Pending'
-    GROUP BY new_department, ticket_currently_pending_with
+    GROUP BY department_id, officer_id
 ),
 final AS (
     SELECT 
-        s.new_department AS department_name,
+        d.department AS department_name,
         s.total_tickets,
         s.pending_tickets,
         s.closed_tickets,
-        COALESCE(o.nodal_officer, 'Unassigned') AS nodal_officer,
+        COALESCE(n.officer, 'Unassigned') AS nodal_officer,
         COALESCE(o.officer_pending, 0)::int AS nodal_officer_pending_count
     FROM summary s
+    LEFT JOIN dim_department d 
+        ON d.department_id = s.department_id
     LEFT JOIN officer_rank o 
-        ON s.new_department = o.new_department AND o.rn = 1
+        ON s.department_id = o.department_id AND o.rn = 1
+    LEFT JOIN dim_officer n 
+        ON n.officer_id = o.officer_id
 ),
 combined AS (
     SELECT 
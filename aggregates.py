@@ -0,0 +1,96 @@
+import time
+import logging
+from sqlalchemy import inspect, text
+from bulk_loader import build_indexes, swap_in
+from load_metadata import read_metadata
+
+# ======================================================
+# Report aggregates, rebuilt from staging_grievance after every load
+# ======================================================
+# Table name -> (SELECT producing it, columns to index). Kept to portable SQL
+# so the same statements run on PostgreSQL and the local SQLite stand-in.
+# They group on the integer keys and join the dimension tables for the names.
+AGGREGATES = {
+    "report_department_summary": ("""
+        WITH summary AS (
+            SELECT
+                department_id,
+                COUNT(DISTINCT grievance_id) AS total_tickets,
+                COUNT(DISTINCT CASE WHEN status = 'Pending' THEN grievance_id END) AS pending_tickets,
+                COUNT(DISTINCT CASE WHEN status = 'Closed' THEN grievance_id END) AS closed_tickets
+            FROM staging_grievance
+            GROUP BY department_id
+        ),
+        officer_rank AS (
+            SELECT
+                department_id,
+                officer_id,
+                COUNT(DISTINCT grievance_id) AS officer_pending,
+                ROW_NUMBER() OVER (
+                    PARTITION BY department_id
+                    ORDER BY COUNT(DISTINCT grievance_id) DESC
+                ) AS rn
+            FROM staging_grievance
+            WHERE status = 'Pending'
+            GROUP BY department_id, officer_id
+        )
+        SELECT
+            d.department AS new_department,
+            CAST(s.total_tickets AS INTEGER) AS total_tickets,
+            CAST(s.pending_tickets AS INTEGER) AS pending_tickets,
+            CAST(s.closed_tickets AS INTEGER) AS closed_tickets,
+            COALESCE(n.officer, 'Unassigned') AS nodal_officer,
+            CAST(COALESCE(o.officer_pending, 0) AS INTEGER) AS nodal_officer_pending_count
+        FROM summary s
+        LEFT JOIN dim_department d ON d.department_id = s.department_id
+        LEFT JOIN officer_rank o
+            ON s.department_id = o.department_id AND o.rn = 1
+        LEFT JOIN dim_officer n ON n.officer_id = o.officer_id
+    """, []),
+
+    "report_officer_pending": ("""
+        SELECT
+            p.officer_id,
+            o.officer,
+            CAST(COUNT(DISTINCT p.grievance_id) AS INTEGER) AS pending_grievances
+        FROM staging_grievance p
+        LEFT JOIN dim_officer o ON o.officer_id = p.officer_id
+        WHERE p.status = 'Pending'
+        GROUP BY p.officer_id, o.officer
+    """, ["officer_id"]),
+
+    "report_officer_category_pending": ("""
+        SELECT
+            p.officer_id,
+            o.officer,
+            c.category AS new_category,
+            CAST(COUNT(DISTINCT p.grievance_id) AS INTEGER) AS pending_grievances
+        FROM staging_grievance p
+        LEFT JOIN dim_officer o ON o.officer_id = p.officer_id
+        LEFT JOIN dim_category c ON c.category_id = p.category_id
+        WHERE p.status = 'Pending'
+        GROUP BY p.officer_id, o.officer, p.category_id, c.category
+    """, ["officer_id"]),
+}
+
+
+def build_aggregates(con):
+    """Recompute every aggregate table into a shadow copy and swap each one in."""
+    t0 = time.perf_counter()
+    q = con.dialect.identifier_preparer.quote
+    for table, (select, index_columns) in AGGREGATES.items():
+        shadow = f"{table}_shadow"
+        with con.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {q(shadow)}"))
+            conn.execute(text(f"CREATE TABLE {q(shadow)} AS {select}"))
+        build_indexes(con, shadow, index_columns)
+        swap_in(con, shadow, table, index_columns)
+    logging.info(f"📊 Report aggregates rebuilt in {time.perf_counter() - t0:.2f} sec")
+
+
+def aggregates_ready(con):
+    """True when every aggregate table exists, i.e. a load has built them."""
+    if read_metadata().get("aggregates"):
+        return True
+    insp = inspect(con)
+    return all(insp.has_table(table) for table in AGGREGATES)
@@ -0,0 +1,332 @@
+"""
+Both reports computed in pandas from the normalized data, no database needed.
+
+officer_summary() reproduces Sqlqueries/NodalOfficersqlQueries.sql and
+pending_summary() reproduces Sqlqueries/NodalAnalysisReport.sql, column for
+column. They run on any staging_grievance frame (filter_frame() applies the
+report filters the SQL files bind); report_from_snapshot()
+reads only the needed columns of the current load's Parquet snapshot, and
+fetch_report() / stream_report() are what the PDF generators call: the
+database first, this engine when the database fails.
+
+    python analytics.py --verify    # compare with the SQL files on the configured database
+"""
+import os
+import re
+import sys
+import logging
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from aggregates import aggregates_ready
+from dimension_tables import NAMED_GRIEVANCES_SQL
+from load_metadata import current_data_version
+from pdf_stream import STREAM_CHUNK_ROWS, read_sql_chunks
+from query_cache import read_sql_cached
+from query_diagnostics import QUERY_DIAGNOSTICS, record_plan
+from report_filters import TOP_OFFICERS, bound_params, is_filtered, report_filters
+from snapshots import load_snapshot
+from config_cloud import *
+
+REPORT_COLUMNS = ["grievance_id", "status", "new_department", "new_category", "ticket_currently_pending_with",
+                  "district", "date_of_complaint"]
+
+
+def _pending(df):
+    return df[df["status"] == "Pending"]
+
+
+def _count_distinct(df, keys):
+    """COUNT(DISTINCT grievance_id) ... GROUP BY keys (NULL keys form their own group)."""
+    return df.groupby(keys, dropna=False, observed=True, sort=False)["grievance_id"].nunique()
+
+
+def officer_summary(df):
+    """Department totals with the top pending officer per department, plus a Grand Total row."""
+    ids = df["grievance_id"]
+    summary = pd.DataFrame({
+        "total_tickets": _count_distinct(df, "new_department"),
+        "pending_tickets": _count_distinct(df.assign(grievance_id=ids.where(df["status"] == "Pending")), "new_department"),
+        "closed_tickets": _count_distinct(df.assign(grievance_id=ids.where(df["status"] == "Closed")), "new_department"),
+    })
+
+    # ROW_NUMBER() = 1 per department; ties go to the first officer by name
+    officers = _count_distinct(_pending(df), ["new_department", "ticket_currently_pending_with"]).rename("officer_pending")
+    officers = officers.reset_index().sort_values(
+        ["new_department", "officer_pending", "ticket_currently_pending_with"],
+        ascending=[True, False, True], na_position="last", kind="stable",
+    )
+    top = officers.drop_duplicates("new_department").dropna(subset=["new_department"]).set_index("new_department")
+
+    # LEFT JOIN on new_department: a NULL department never matches
+    summary = summary.join(top, how="left")
+    final = pd.DataFrame({
+        "Department Name": summary.index.astype(object),
+        "Total Ticket": summary["total_tickets"].to_numpy(),
+        "Pending Ticket": summary["pending_tickets"].to_numpy(),
+        "Closed Ticket": summary["closed_tickets"].to_numpy(),
+        "Pending With Nodal Officer": summary["ticket_currently_pending_with"].astype(object).fillna("Unassigned").to_numpy(),
+        "Nodal Officer Pending Count": summary["officer_pending"].fillna(0).astype(int).to_numpy(),
+    }).sort_values("Total Ticket", ascending=False, kind="stable")
+
+    grand_total = pd.DataFrame([{
+        "Department Name": "Grand Total",
+        "Total Ticket": final["Total Ticket"].sum(),
+        "Pending Ticket": final["Pending Ticket"].sum(),
+        "Closed Ticket": final["Closed Ticket"].sum(),
+        "Pending With Nodal Officer": "—",
+        "Nodal Officer Pending Count": final["Nodal Officer Pending Count"].sum(),
+    }])
+    return pd.concat([final, grand_total], ignore_index=True)
+
+
+def pending_summary(df, top_n=TOP_OFFICERS):
+    """Pending grievances per category for the `top_n` officers with the most pending grievances."""
+    pending = _pending(df)
+    pending = pending.assign(User=pending["ticket_currently_pending_with"].astype(object).str.strip(" "))
+
+    totals = _count_distinct(pending, "User").rename("Total Pending (All Categories)").reset_index()
+    totals = totals.sort_values(
+        ["Total Pending (All Categories)", "User"], ascending=[False, True], na_position="last", kind="stable"
+    ).head(top_n)
+    # the NULL officer can take a top slot but never joins
+    return _officer_categories(pending, totals.dropna(subset=["User"]))
+
+
+def _officer_categories(pending, totals):
+    """Per-category rows of the officers in `totals` (User, Total Pending), in report order."""
+    rows = _count_distinct(pending[pending["User"].isin(totals["User"])], ["User", "new_category"])
+    rows = rows.rename("Pending Grievances").reset_index().rename(columns={"new_category": "Category"})
+    rows["Category"] = rows["Category"].astype(object)
+    rows = rows.merge(totals, on="User")
+    return rows.sort_values(
+        ["Total Pending (All Categories)", "User", "Pending Grievances"],
+        ascending=[False, True, False], kind="stable",
+    ).reset_index(drop=True)[["User", "Category", "Pending Grievances", "Total Pending (All Categories)"]]
+
+
+REPORTS = {
+    "nodal_officer": officer_summary,
+    "pending_summary": pending_summary,
+}
+
+
+def filter_frame(df, filters=None):
+    """The WHERE clause of the report SQL files (report_filters.bound_params) in pandas."""
+    params = bound_params(filters)
+    mask = pd.Series(True, index=df.index)
+    if params["district"]:
+        mask &= df["district"] == params["district"]
+    if params["department"]:
+        mask &= df["new_department"] == params["department"]
+    if params["date_from"]:
+        mask &= df["date_of_complaint"] >= pd.Timestamp(params["date_from"])
+    if params["date_before"]:
+        mask &= df["date_of_complaint"] < pd.Timestamp(params["date_before"])
+    return df if mask.all() else df[mask]
+
+
+def report_from_snapshot(report, version=None, filters=None):
+    """
+    Compute `report` ("nodal_officer" or "pending_summary") from the snapshot of
+    `version` (default: the data currently loaded). Raises FileNotFoundError
+    when that snapshot is missing rather than reading an older load's.
+    """
+    filters = report_filters(**(filters or {}))
+    version = version or current_data_version()
+    try:
+        snapshot = load_snapshot("staging_grievance", columns=REPORT_COLUMNS, version=version)
+    except FileNotFoundError as e:
+        # reports are registered under the current data version: an older snapshot would pass for it
+        logging.error(f"❌ No snapshot of data version {version}; not computing {report} from an older load ({e})")
+        raise
+    frame = filter_frame(snapshot, filters)
+    logging.info(f"Computing {report} in-process from the snapshot ({len(frame):,} rows)")
+    if report == "pending_summary":
+        return pending_summary(frame, filters["top_n"])
+    return REPORTS[report](frame)
+
+
+def portable_sql(sql_query, con):
+    # PostgreSQL's ::int casts are the only non-portable syntax in the report files
+    return sql_query if con.dialect.name == "postgresql" else re.sub(r"::int\b", "", sql_query)
+
+
+def report_sql(summary_sql_path, sql_path, con=engine, filters=None):
+    """
+    SQL text of a report: the summary-table variant once a load has built the
+    tables, unless `filters` narrow the report (the summaries cover everything).
+    """
+    if aggregates_ready(con) and not is_filtered(filters):
+        sql_path = summary_sql_path
+    logging.info(f"Reading SQL query from: {sql_path}")
+    if not os.path.exists(sql_path):
+        raise FileNotFoundError(f"SQL file not found at path: {sql_path}")
+
+    with open(sql_path, 'r') as file:
+        sql_query = file.read().strip()
+
+    if not sql_query:
+        raise ValueError("SQL file is empty. Please add a valid query.")
+    return portable_sql(sql_query, con)
+
+
+def fetch_report(report, summary_sql_path, sql_path, source="auto", con=engine, filters=None):
+    """
+    Rows of `report` for the PDF generators.
+
+    source="database" runs the SQL file (the summary-table variant once a load
+    has built them; cached per data version and filter set), "snapshot"
+    computes the report here, and "auto" tries the database and falls back to
+    the snapshot. `filters` (report_filters.report_filters) are bound into the SQL.
+    With CMCONNECT_QUERY_DIAGNOSTICS=1 the query plan is captured whenever the
+    query actually runs, i.e. not on cache hits (query_diagnostics).
+    """
+    if source != "snapshot":
+        try:
+            sql_query = report_sql(summary_sql_path, sql_path, con, filters)
+            on_miss = None
+            if QUERY_DIAGNOSTICS:
+                on_miss = lambda: record_plan(report, sql_query, con, bound_params(filters), filters)
+            logging.info("Executing SQL query (cached until the next data load)...")
+            return read_sql_cached(sql_query, con, params=bound_params(filters), on_miss=on_miss)
+        except SQLAlchemyError as e:
+            if source == "database":
+                raise
+            logging.warning(f"⚠️ Database query failed ({e.__class__.__name__}); computing {report} from the latest snapshot")
+    return report_from_snapshot(report, filters=filters)
+
+
+def stream_report(report, summary_sql_path, sql_path, source="auto", sort=None, con=engine,
+                  chunksize=STREAM_CHUNK_ROWS, filters=None):
+    """
+    fetch_report() in chunks of `chunksize` rows read from a server-side cursor.
+
+    `sort` is a list of (column, ascending) pairs applied on top of the report's
+    own ORDER BY. The snapshot fallback only applies until the first chunk has
+    arrived; the snapshot result is computed whole and then sliced.
+    """
+    if source != "snapshot":
+        try:
+            sql_query = report_sql(summary_sql_path, sql_path, con, filters)
+            if sort:
+                quote = con.dialect.identifier_preparer.quote
+                order_by = ", ".join(f"{quote(col)} {'ASC' if asc else 'DESC'}" for col, asc in sort)
+                sql_query = f"SELECT * FROM ({sql_query.rstrip(';')}) AS report ORDER BY {order_by}"
+            if QUERY_DIAGNOSTICS:
+                # the plan only: a timed run would execute the whole query before the stream starts
+                record_plan(report, sql_query, con, bound_params(filters), filters, timed=False)
+            logging.info(f"Streaming SQL query in chunks of {chunksize} rows...")
+            chunks = read_sql_chunks(sql_query, con, chunksize, params=bound_params(filters))
+            first = next(chunks, None)
+        except SQLAlchemyError as e:
+            if source == "database":
+                raise
+            logging.warning(f"⚠️ Database query failed ({e.__class__.__name__}); computing {report} from the latest snapshot")
+        else:
+            if first is not None:
+                yield first
+                yield from chunks
+            return
+
+    df = report_from_snapshot(report, filters=filters)
+    if sort:
+        df = df.sort_values([col for col, _ in sort], ascending=[asc for _, asc in sort], kind="stable")
+    for i in range(0, len(df), chunksize):
+        yield df.iloc[i:i + chunksize]
+
+
+# ======================================================
+# Parity check against the SQL files
+# ======================================================
+def compare_reports(expected, actual, key_columns):
+    """Differences between the SQL result and ours, ignoring row order; [] when they match."""
+    problems = []
+    if list(expected.columns) != list(actual.columns):
+        return [f"columns differ: {list(expected.columns)} vs {list(actual.columns)}"]
+    if len(expected) != len(actual):
+        problems.append(f"row count differs: {len(expected)} vs {len(actual)}")
+    expected = expected.astype(object).where(expected.notna(), None)
+    actual = actual.astype(object).where(actual.notna(), None)
+    merged = expected.merge(actual, on=key_columns, how="outer", suffixes=("_sql", "_pandas"), indicator=True)
+    for _, row in merged[merged["_merge"] != "both"].iterrows():
+        problems.append(f"row only in {'SQL' if row['_merge'] == 'left_only' else 'pandas'}: "
+                        f"{[row[c] for c in key_columns]}")
+    both = merged[merged["_merge"] == "both"]
+    for col in expected.columns:
+        if col in key_columns:
+            continue
+        differ = both[both[f"{col}_sql"].astype(str) != both[f"{col}_pandas"].astype(str)]
+        for _, row in differ.iterrows():
+            problems.append(f"{col} for {[row[c] for c in key_columns]}: {row[f'{col}_sql']} vs {row[f'{col}_pandas']}")
+    return problems
+
+
+def settle_ties(frame, sql_officer, ours_officer, sql_pending, ours_pending):
+    """
+    ROW_NUMBER() and LIMIT break ties arbitrarily. Where SQL picked a different
+    but equally ranked nodal officer, take our pick on the SQL side; where it
+    picked other officers tied at the top-N cutoff, rebuild our rows for its
+    pick, so the category rows of the same officers are compared.
+    Returns (sql_officer, ours_pending).
+    """
+    pending = _pending(frame)
+    counts = _count_distinct(pending, ["new_department", "ticket_currently_pending_with"])
+    ours = ours_officer.set_index("Department Name")
+    sql_officer = sql_officer.copy()
+    for i, row in sql_officer.iterrows():
+        department, officer = row["Department Name"], row["Pending With Nodal Officer"]
+        if department not in ours.index or ours.at[department, "Pending With Nodal Officer"] == officer:
+            continue
+        if counts.get((department, officer)) == ours.at[department, "Nodal Officer Pending Count"]:
+            sql_officer.at[i, "Pending With Nodal Officer"] = ours.at[department, "Pending With Nodal Officer"]
+
+    if ours_pending.empty:
+        return sql_officer, ours_pending
+    total = "Total Pending (All Categories)"
+    cutoff = ours_pending[total].min()
+    sql_tied = set(sql_pending.loc[sql_pending[total] == cutoff, "User"])
+    ours_tied = set(ours_pending.loc[ours_pending[total] == cutoff, "User"])
+    if sql_tied != ours_tied and len(sql_tied) == len(ours_tied):
+        pending = pending.assign(User=pending["ticket_currently_pending_with"].astype(object).str.strip(" "))
+        totals = _count_distinct(pending, "User")
+        # only a pick of officers that really are tied at the cutoff is accepted
+        if all(totals.get(user) == cutoff for user in sql_tied):
+            users = (set(ours_pending["User"]) - ours_tied) | sql_tied
+            picked = totals[totals.index.isin(users)].rename(total).reset_index()
+            ours_pending = _officer_categories(pending, picked)
+    return sql_officer, ours_pending
+
+
+def verify(con=engine):
+    """
+    Run both SQL files and both pandas reports on the same staging_grievance
+    (names joined back from the dimension tables); prints and returns the mismatches.
+    """
+    with con.connect() as connection:
+        frame = pd.read_sql(text(NAMED_GRIEVANCES_SQL), connection)[REPORT_COLUMNS]
+        with open(SQL_QUERY_PATH1) as f:
+            sql_officer = pd.read_sql(text(portable_sql(f.read(), con)), connection, params=bound_params(None))
+        with open(SQL_QUERY_PATH2) as f:
+            sql_pending = pd.read_sql(text(portable_sql(f.read(), con)), connection, params=bound_params(None))
+
+    ours_officer, ours_pending = officer_summary(frame), pending_summary(frame)
+    sql_officer, ours_pending = settle_ties(frame, sql_officer, ours_officer, sql_pending, ours_pending)
+
+    problems = []
+    for name, expected, actual, keys in (
+        ("Nodal Officer report", sql_officer, ours_officer, ["Department Name"]),
+        ("Pending Summary report", sql_pending, ours_pending, ["User", "Category"]),
+    ):
+        found = compare_reports(expected, actual, keys)
+        print(f"{name}: {len(expected)} SQL rows, {len(actual)} pandas rows, {len(found)} difference(s)")
+        problems.extend(f"{name}: {p}" for p in found)
+    for p in problems:
+        print(f"  {p}")
+    return problems
+
+
+if __name__ == "__main__":
+    if "--verify" in sys.argv:
+        sys.exit(1 if verify() else 0)
+    print(__doc__)
@@ -1,11 +1,14 @@
 import streamlit as st
 import os
 import time
-import traceback
+import hashlib
 
-from normalization import run_normalization
-from generate_pdf import generate_pdf_from_sql
-from report_pdf import generate_pdf2_from_sql
+from coordination import run_report, stage_upload
+from jobs import JobRunner
+from load_metadata import current_data_version, read_metadata
+from prebuild import prebuild_reports, prebuilt_report, start_schedule
+from report_filters import TOP_OFFICERS, filter_key, report_filters
+from report_store import MIME_TYPES, exported_report, latest_report, read_manifest, report_path
 from config_cloud import *
 
 # =======================================================
@@ -13,14 +16,13 @@ from config_cloud import *
 # =======================================================
 st.set_page_config(page_title="CM Connect Report Automation", layout="centered")
 
-# Background Image
-def set_bg_center_transparent(image_path):
+# Background Image (encoded once per image version, not on every rerun)
+@st.cache_data(show_spinner=False)
+def background_css(image_path, mtime):
     import base64
-    if not os.path.exists(image_path):
-        return
     with open(image_path, "rb") as img:
         encoded = base64.b64encode(img.read()).decode()
-    css = f"""
+    return f"""
     <style>
     [data-testid="stAppViewContainer"] {{
         background: none;
@@ -42,7 +44,12 @@ def set_bg_center_transparent(image_path):
     }}
     </style>
     """
-    st.markdown(css, unsafe_allow_html=True)
+
+
+def set_bg_center_transparent(image_path):
+    if not os.path.exists(image_path):
+        return
+    st.markdown(background_css(image_path, os.path.getmtime(image_path)), unsafe_allow_html=True)
 
 set_bg_center_transparent(PICTURE_PATH)
 
@@ -50,18 +57,158 @@ st.title("📊 CM Connect Automated Reporting Webapp")
 st.markdown("---")
 
 # =======================================================
-# Utils
+# Background jobs (shared by every session of this server)
 # =======================================================
-def get_latest_pdf():
-    try:
-        files = [f for f in os.listdir(REPORT_PATH) if f.endswith(".pdf")]
-        if not files:
-            return None
-        latest = max(files, key=lambda x: os.path.getmtime(os.path.join(REPORT_PATH, x)))
-        return os.path.join(REPORT_PATH, latest)
-    except:
+POLL_SECONDS = 1.0
+
+
+@st.cache_resource
+def get_job_runner():
+    return JobRunner()
+
+
+jobs = get_job_runner()
+
+
+@st.cache_resource
+def get_prebuild_schedule():
+    # optional recurring warm-up (CMCONNECT_PREBUILD_EVERY_MINUTES), one per server
+    return start_schedule()
+
+
+get_prebuild_schedule()
+
+
+# Pipeline modules (pandas, SQLAlchemy, ReportLab, openpyxl) are imported
+# when their action runs, not on every rerun of the page
+def normalization_job(excel_path, incremental, force, progress):
+    from normalization import run_normalization
+
+    summary = run_normalization(incremental=incremental, force=force, progress=progress, excel_path=excel_path)
+    if not summary:
+        raise RuntimeError("Normalization failed! Check logs.")
+    # render both reports for the new data while nobody is waiting for them
+    summary["prebuild_job"] = jobs.submit("prebuild", prebuild_reports, label="Report warm-up")
+    return summary
+
+
+def report_job(generate, progress, **kwargs):
+    # identical requests from other sessions share one run (coordination.run_report)
+    result = run_report(generate, progress=progress, **kwargs)
+    if not result:
+        raise RuntimeError("Report generation failed or the query returned no data. Check logs.")
+    return result
+
+
+def export_job(progress, **kwargs):
+    # openpyxl and the query stack load only when an export actually runs
+    from report_export import export_report
+
+    return report_job(export_report, progress, **kwargs)
+
+
+def show_job(state_key):
+    """Show the status of this session's job; returns it once finished, polling while it runs."""
+    job = jobs.get(st.session_state.get(state_key))
+    if job is None:
         return None
 
+    st.progress(int(job.progress * 100), text=job.message)
+    if not job.done:
+        st.caption(f"⏳ {job.label}: {job.status}, {job.elapsed:.0f} sec elapsed. This page refreshes automatically.")
+        time.sleep(POLL_SECONDS)
+        st.rerun()
+
+    if job.status == "failed":
+        st.error(f"❌ {job.label} failed: {job.message}")
+        st.code(job.error)
+    return job
+
+
+@st.cache_data(show_spinner=False)
+def filter_options(data_version):
+    """Districts and departments offered as report filters, read once per data version."""
+    from sqlalchemy import text
+    from dimension_tables import DIMENSIONS
+
+    options = {}
+    try:
+        with engine.connect() as connection:
+            for column in ("district", "new_department"):
+                # values still present in the loaded data (dimension tables keep old ones)
+                table, key, name = DIMENSIONS[column]
+                rows = connection.execute(text(
+                    f"SELECT {name} FROM {table} d "
+                    f"WHERE EXISTS (SELECT 1 FROM staging_grievance g WHERE g.{key} = d.{key}) ORDER BY {name}"
+                ))
+                options[column] = [row[0] for row in rows]
+    except Exception:
+        return {"district": [], "new_department": []}
+    return options
+
+
+def choose_filters(page, with_top_n=False):
+    """Report filter widgets; returns the report_filters() selection."""
+    options = filter_options(current_data_version())
+    with st.expander("🔎 Filters (optional)"):
+        district = st.selectbox("District", ["All"] + options["district"], key=f"{page}_district")
+        department = st.selectbox("Department", ["All"] + options["new_department"], key=f"{page}_department")
+        date_from = date_to = None
+        if st.checkbox("Only complaints within a date range", key=f"{page}_dated"):
+            left, right = st.columns(2)
+            date_from = left.date_input("From", key=f"{page}_date_from")
+            date_to = right.date_input("To", key=f"{page}_date_to")
+        top_n = TOP_OFFICERS
+        if with_top_n:
+            top_n = st.number_input("Officers in the report", min_value=1, max_value=500,
+                                    value=TOP_OFFICERS, key=f"{page}_top_n")
+    return report_filters(
+        district=None if district == "All" else district,
+        department=None if department == "All" else department,
+        date_from=date_from,
+        date_to=date_to,
+        top_n=top_n,
+    )
+
+
+def download_pdf(path):
+    # Streamlit reads the handle itself; no extra bytes copy of the report here
+    with open(path, "rb") as report:
+        st.download_button(
+            "⬇️ Download Report",
+            data=report,
+            file_name=os.path.basename(path),
+            mime="application/pdf",
+        )
+
+
+def export_buttons(report, filters):
+    """CSV / Excel downloads of the report rows, written in the background like the PDFs."""
+    st.caption("For further analysis, the same rows as a spreadsheet:")
+    for column, (fmt, label) in zip(st.columns(2), (("csv", "CSV"), ("xlsx", "Excel"))):
+        with column:
+            state_key = f"{report}_{fmt}_export_job"
+            path = exported_report(report, fmt, current_data_version(), filter_key(filters))
+            if not path and st.button(f"📊 Export {label}", key=f"{report}_{fmt}_export"):
+                st.session_state[state_key] = jobs.submit(
+                    "report", export_job, report=report, fmt=fmt, filters=filters,
+                    label=f"{label} export",
+                )
+                st.session_state[f"{state_key}_filters"] = filter_key(filters)
+            if st.session_state.get(f"{state_key}_filters") == filter_key(filters):
+                job = show_job(state_key)
+                if job and job.status == "succeeded":
+                    path = path or job.result
+            if path:
+                with open(path, "rb") as export:
+                    st.download_button(
+                        f"⬇️ Download {label}",
+                        data=export,
+                        file_name=os.path.basename(path),
+                        mime=MIME_TYPES[fmt],
+                        key=f"{report}_{fmt}_download",
+                    )
+
 # =======================================================
 # Sidebar
 # =======================================================
@@ -74,11 +221,12 @@ action = st.sidebar.radio(
         "📄 Generate Pending Summary Report",
         "📂 View Latest Report",
         "📜 View Logs",
+        "📈 Pipeline Metrics",
     ],
 )
 
 # =======================================================
-# NORMALIZATION — Synchronous + Progress Bar
+# NORMALIZATION — Background job + real progress
 # =======================================================
 if action == "🏁 Run Data Normalization":
 
@@ -86,44 +234,57 @@ if action == "🏁 Run Data Normalization":
 
     uploaded_file = st.file_uploader("Upload Latest EPS & CRM Excel File", type=["xlsx"])
 
-    if uploaded_file:
+    # Reruns (e.g. while polling a job) must not rewrite the same upload
+    if uploaded_file and st.session_state.get("saved_upload") != uploaded_file.file_id:
         st.info("📁 Upload received. Saving to RAW_DATA_PATH...")
 
-        # Clear old files
-        for old in os.listdir(RAW_DATA_PATH):
-            os.remove(os.path.join(RAW_DATA_PATH, old))
-
-        # Save file
-        new_path = os.path.join(RAW_DATA_PATH, uploaded_file.name)
-        with open(new_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
+        # Each upload gets its own directory: other sessions' files are left alone
+        st.session_state["upload_path"] = stage_upload(uploaded_file.name, uploaded_file.getbuffer())
+        # hashed once per upload, not on every rerun
+        st.session_state["upload_sha256"] = hashlib.sha256(uploaded_file.getbuffer()).hexdigest()
+        st.session_state["saved_upload"] = uploaded_file.file_id
 
+    if uploaded_file:
         st.success(f"✅ File uploaded: {uploaded_file.name}")
 
-        # Run Button
-        if st.button("Run Normalization"):
-            st.info("⚙️ Normalization running... Please wait")
+        last_load = read_metadata()
+        if st.session_state.get("upload_sha256") == last_load.get("fingerprint", {}).get("sha256"):
+            st.info(f"ℹ️ This exact workbook was already loaded on {last_load.get('loaded_at')}. "
+                    "Running normalization again will be a no-op.")
 
-            # Progress UI
-            progress = st.progress(0)
-            status = st.empty()
+        incremental = st.checkbox(
+            "Incremental load (apply only grievances that changed since the last load)",
+            value=False,
+        )
+        force = st.checkbox("Reload everything, even if the workbook or its CRM sheet is unchanged", value=False)
 
-            # Visual-only progress updates
-            for i in range(1, 30):
-                progress.progress(i)
-                status.write("Reading Excel...")
-                time.sleep(0.05)
+        running = jobs.active("normalization")
 
-            # Actual normalization
-            success = run_normalization()
+        # Run Button
+        if st.button("Run Normalization", disabled=bool(running)):
+            st.session_state["normalization_job"] = jobs.submit(
+                "normalization", normalization_job, st.session_state["upload_path"], incremental, force,
+                label="Normalization",
+            )
+        elif running and st.session_state.get("normalization_job") != running[0].id:
+            st.warning("⚙️ Another normalization is already running. Please wait for it to finish.")
 
-            if success:
-                progress.progress(100)
-                status.write("Completed!")
-                st.success("🎉 Normalization completed successfully!")
-                st.balloons()
-            else:
-                st.error("❌ Normalization failed! Check logs.")
+    job = show_job("normalization_job")
+    if job and job.status == "succeeded" and job.result.get("unchanged"):
+        st.info("⏭️ Nothing to do: this workbook is identical to the last one loaded, so the data was left as is.")
+    elif job and job.status == "succeeded":
+        if job.result.get("skipped"):
+            st.info("⏭️ The CRM sheet is unchanged since the last load, so only the EPS sheet was reloaded.")
+        if job.result.get("widened"):
+            st.warning("⚠️ Loaded as text, since later rows hold values that do not fit the column type of the "
+                       f"first rows: {', '.join(job.result['widened'])}")
+        st.success("🎉 Normalization completed successfully!")
+        warmup = jobs.get(job.result.get("prebuild_job"))
+        if warmup and not warmup.done:
+            st.caption("🔥 Both reports are being pre-built for the new data; they will be ready on their pages.")
+        if not st.session_state.get(f"celebrated_{job.id}"):
+            st.session_state[f"celebrated_{job.id}"] = True
+            st.balloons()
 
 # =======================================================
 # Generate Nodal Officer Report
@@ -131,22 +292,27 @@ if action == "🏁 Run Data Normalization":
 elif action == "📄 Generate Nodal Officer Report":
     st.subheader("📘 Generate Nodal Officer Report")
 
-    if st.button("Generate Report"):
-        try:
-            generate_pdf_from_sql()
-            st.success("✅ Report generated!")
+    filters = choose_filters("officer")
+    # each filter set is rendered once per data version; later requests reuse the PDF
+    prebuilt = prebuilt_report("nodal_officer", filters)
 
-            latest = get_latest_pdf()
-            if latest:
-                st.download_button(
-                    "⬇️ Download Report",
-                    data=open(latest, "rb").read(),
-                    file_name=os.path.basename(latest),
-                    mime="application/pdf",
-                )
-        except Exception as e:
-            st.error(str(e))
-            st.code(traceback.format_exc())
+    if st.button("Generate Again" if prebuilt else "Generate Report"):
+        from generate_pdf import generate_pdf_from_sql
+
+        st.session_state["officer_report_job"] = jobs.submit(
+            "report", report_job, generate_pdf_from_sql, filters=filters, label="Nodal Officer Report"
+        )
+        st.session_state["officer_report_filters"] = filter_key(filters)
+
+    job = show_job("officer_report_job")
+    if job and job.status == "succeeded" and st.session_state.get("officer_report_filters") == filter_key(filters):
+        st.success("✅ Report generated!")
+        download_pdf(job.result)
+    elif prebuilt:
+        st.success(f"⚡ Report ready: already rendered from the data currently loaded (version {prebuilt['data_version']}).")
+        download_pdf(report_path(prebuilt))
+
+    export_buttons("nodal_officer", filters)
 
 # =======================================================
 # Generate Pending Summary Report
@@ -154,22 +320,40 @@ elif action == "📄 Generate Nodal Officer Report":
 elif action == "📄 Generate Pending Summary Report":
     st.subheader("📗 Generate Summary Report")
 
-    if st.button("Generate Pending Report"):
-        try:
-            generate_pdf2_from_sql()
-            st.success("✅ Summary Report generated!")
+    burst = st.checkbox("Also create a separate PDF for each nodal officer (zip)", value=False)
+
+    filters = choose_filters("summary", with_top_n=True)
+    prebuilt = None if burst else prebuilt_report("pending_summary", filters)
+
+    if st.button("Generate Again" if prebuilt else "Generate Pending Report"):
+        from report_pdf import generate_pdf2_from_sql
 
-            latest = get_latest_pdf()
-            if latest:
+        st.session_state["summary_report_job"] = jobs.submit(
+            "report", report_job, generate_pdf2_from_sql, burst=burst, filters=filters, label="Pending Summary Report"
+        )
+        st.session_state["summary_report_filters"] = filter_key(filters)
+
+    job = show_job("summary_report_job")
+    if job and job.status == "succeeded" and st.session_state.get("summary_report_filters") == filter_key(filters):
+        outputs = job.result
+        st.success("✅ Summary Report generated!")
+
+        if outputs.get("bundle"):
+            with open(outputs["bundle"], "rb") as bundle:
                 st.download_button(
-                    "⬇️ Download Report",
-                    data=open(latest, "rb").read(),
-                    file_name=os.path.basename(latest),
-                    mime="application/pdf",
+                    f"⬇️ Download {len(outputs['officers'])} Officer Reports (zip)",
+                    data=bundle,
+                    file_name=os.path.basename(outputs["bundle"]),
+                    mime="application/zip",
                 )
-        except Exception as e:
-            st.error(str(e))
-            st.code(traceback.format_exc())
+
+        if outputs.get("combined"):
+            download_pdf(outputs["combined"])
+    elif prebuilt:
+        st.success(f"⚡ Report ready: already rendered from the data currently loaded (version {prebuilt['data_version']}).")
+        download_pdf(report_path(prebuilt))
+
+    export_buttons("pending_summary", filters)
 
 # =======================================================
 # View Latest Report
@@ -177,15 +361,13 @@ elif action == "📄 Generate Pending Summary Report":
 elif action == "📂 View Latest Report":
     st.subheader("🗂️ Latest PDF")
 
-    latest = get_latest_pdf()
+    latest = latest_report()
     if latest:
-        st.success(f"📄 Latest: {os.path.basename(latest)}")
-        st.download_button(
-            "⬇️ Download Report",
-            data=open(latest, "rb").read(),
-            file_name=os.path.basename(latest),
-            mime="application/pdf",
-        )
+        version = f", data version {latest['data_version']}" if latest.get("data_version") else ""
+        st.success(f"📄 Latest: {latest['file']}{version}")
+        download_pdf(report_path(latest))
+        reports = read_manifest()
+        st.caption(f"{len(reports)} reports kept, {sum(r['size'] for r in reports) / 1024 / 1024:.1f} MB in total.")
     else:
         st.warning("No reports available.")
 
@@ -203,3 +385,72 @@ elif action == "📜 View Logs":
         if st.button("View Log"):
             with open(os.path.join(LOG_DIR, selected)) as f:
                 st.text_area("Log Content", f.read(), height=400)
+
+# =======================================================
+# Pipeline Metrics
+# =======================================================
+elif action == "📈 Pipeline Metrics":
+    import pandas as pd
+    from metrics import read_metrics
+
+    st.subheader("📈 Pipeline Stage Timings")
+
+    records = read_metrics(limit_runs=30)
+    if not records:
+        st.warning("No pipeline runs recorded yet.")
+    else:
+        df = pd.DataFrame(records)
+        pipeline = st.selectbox("Pipeline", sorted(df["pipeline"].unique()))
+        runs = df[df["pipeline"] == pipeline]
+        runs = runs.assign(run=runs["ts"].str.replace("T", " ") + " · " + runs["run_id"].str[:6])
+
+        stages = runs[runs["stage"] != "total"]
+        st.markdown("**Wall time per stage (sec)**")
+        st.bar_chart(stages.pivot_table(index="run", columns="stage", values="wall_s", aggfunc="sum"))
+
+        totals = runs[runs["stage"] == "total"].set_index("run")
+        st.markdown("**Total wall time (sec) and RSS growth over the run (MB)**")
+        # runs recorded before per-stage RSS carry no rss_* fields
+        st.line_chart(totals.reindex(columns=["wall_s", "rss_growth_mb"]))
+
+        st.markdown("**Latest run**")
+        latest = runs[runs["run_id"] == runs["run_id"].iloc[-1]]
+        st.dataframe(latest.reindex(columns=["stage", "wall_s", "rows", "calls", "rss_mb", "rss_growth_mb"]),
+                     hide_index=True)
+
+    st.subheader("🔌 Database Connections")
+    st.dataframe(pd.DataFrame(pool_status()).T)
+
+    from query_diagnostics import capture_plans, plan_regressions, plan_versions, read_plans, store_plans
+
+    st.subheader("🔍 Report Query Plans")
+    if st.button("Capture Query Plans", help="EXPLAIN and time every report query on the data loaded now"):
+        with st.spinner("Explaining the report queries..."):
+            store_plans(capture_plans())
+
+    versions = plan_versions()
+    if not versions:
+        st.info("No query plans captured yet. Capture them above, or run reports with "
+                "CMCONNECT_QUERY_DIAGNOSTICS=1 to record the plan of every report query.")
+    else:
+        version = st.selectbox("Data version", versions[::-1])
+        stored = read_plans(version)
+        queries = stored.get("queries", {})
+        st.dataframe(pd.DataFrame([
+            {"query": label, "ms": q.get("execution_ms"), "rows": q.get("rows"),
+             "scans": "; ".join(q.get("scans", [])) or q.get("error"), "captured": q.get("captured_at")}
+            for label, q in queries.items()
+        ]), hide_index=True)
+
+        # differences from the plans of the previous data version
+        older = [v for v in versions if v < version]
+        if older:
+            changes = plan_regressions(read_plans(older[-1]).get("queries", {}), queries)
+            for change in changes:
+                st.warning(f"⚠️ Since data version {older[-1]}: {change}")
+            if not changes:
+                st.caption(f"Same plans as data version {older[-1]}, no query markedly slower.")
+
+        for label, q in queries.items():
+            with st.expander(f"{label} · {stored.get('dialect')}"):
+                st.code(q.get("plan") or q.get("error"), language=None)
@@ -0,0 +1,87 @@
+"""
+Cold start and warm rerun time of the Streamlit app (app.py), per sidebar page.
+
+    python benchmarks/bench_app.py --reruns 20
+
+Cold start is the first run of the script in a fresh process (Streamlit itself
+already imported), which is what the first visitor after a deploy or restart
+waits for. A warm rerun is every later interaction. Runs through Streamlit's
+AppTest harness against a throwaway data directory and SQLite database.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(os.path.dirname(BENCH_DIR), "app.py")
+
+PAGES = [
+    "🏁 Run Data Normalization",
+    "📄 Generate Nodal Officer Report",
+    "📄 Generate Pending Summary Report",
+    "📂 View Latest Report",
+    "📜 View Logs",
+    "📈 Pipeline Metrics",
+]
+
+
+def child(page, reruns):
+    from streamlit.testing.v1 import AppTest
+
+    before = set(sys.modules)
+    at = AppTest.from_file(APP_PATH, default_timeout=60)
+    t0 = time.perf_counter()
+    at.run()
+    if page != PAGES[0]:
+        at.sidebar.radio[0].set_value(page).run()
+    cold = time.perf_counter() - t0
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+
+    warm = []
+    for _ in range(reruns):
+        t0 = time.perf_counter()
+        at.run()
+        warm.append(time.perf_counter() - t0)
+    heavy = sorted(m for m in ("pandas", "reportlab", "openpyxl", "sqlalchemy") if m in set(sys.modules) - before)
+    return {"cold_s": cold, "warm_ms": statistics.median(warm) * 1000, "imported": heavy}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reruns", type=int, default=20)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child(args.child, args.reruns)))
+        return 0
+
+    workdir = tempfile.mkdtemp(prefix="cmconnect_app_")
+    env = dict(os.environ, CMCONNECT_DATA_DIR=workdir,
+               CMCONNECT_DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+    try:
+        os.makedirs(os.path.join(workdir, "Reports"))
+        for i in range(200):
+            with open(os.path.join(workdir, "Reports", f"Nodal_Officer_Report_{i:04d}.pdf"), "wb") as f:
+                f.write(b"%PDF-1.4\n" + os.urandom(64 * 1024))
+
+        print(f"{'page':<36} {'cold s':>7} {'warm ms':>8}  heavy modules imported")
+        for page in PAGES:
+            out = subprocess.run([sys.executable, __file__, "--child", page, "--reruns", str(args.reruns)],
+                                 env=env, check=True, capture_output=True, text=True, cwd=workdir).stdout
+            result = json.loads(out.strip().splitlines()[-1])
+            print(f"{page:<36} {result['cold_s']:>7.2f} {result['warm_ms']:>8.1f}  {', '.join(result['imported']) or '-'}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
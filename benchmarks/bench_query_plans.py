@@ -0,0 +1,116 @@
+"""
+Plan and timing regression check of the bundled report SQL on synthetic data.
+
+    python benchmarks/bench_query_plans.py --rows 20000
+    python benchmarks/bench_query_plans.py --rows 20000 --update-baseline
+    python benchmarks/bench_query_plans.py --url postgresql+psycopg2://user:pw@localhost/bench
+
+A synthetic workbook (see synthetic_data.py) is loaded into a throwaway data
+directory and database (an SQLite file unless --url is given; the Postgres
+database is overwritten). Every file in Sqlqueries/ is then explained and
+timed (query_diagnostics.capture_plans), the raw-table files also with report
+filters bound, keeping the fastest of --repeat runs.
+
+The plans are compared with benchmarks/query_plans_baseline.json, per database
+dialect and scale: the check fails (exit code 1) when a table the baseline read
+through an index is now scanned end to end or when a plan changes otherwise.
+Queries slower than the baseline by more than --tolerance are only reported:
+the baseline timings come from another machine. Refresh the baseline with
+--update-baseline after intentional changes to the SQL or the indexes.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+BASELINE_PATH = os.path.join(BENCH_DIR, "query_plans_baseline.json")
+# Values present in every synthetic workbook (synthetic_data.DISTRICTS / DEPARTMENTS)
+FILTERED = {"district": "East Khasi Hills", "department": "Power", "date_from": "2023-01-01", "date_to": "2023-12-31"}
+
+
+def capture(repeat):
+    """Plans of every report query on the loaded data; the fastest run of each is kept."""
+    from config_cloud import SQL_QUERY_PATH1, SQL_QUERY_PATH2, engine
+    from query_diagnostics import capture_plans
+
+    best = {}
+    for _ in range(repeat):
+        runs = {**capture_plans(engine), **capture_plans(engine, FILTERED, paths=[SQL_QUERY_PATH1, SQL_QUERY_PATH2])}
+        for label, result in runs.items():
+            if label not in best or (result.get("execution_ms") or 0) < (best[label].get("execution_ms") or 0):
+                best[label] = result
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000, help="EPS rows in the synthetic workbook")
+    parser.add_argument("--url", help="database URL (default: a throwaway SQLite file)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tolerance", type=float, default=None, help="allowed slowdown (default: query_diagnostics.TIME_TOLERANCE)")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="cmconnect_plans_")
+    raw_dir = os.path.join(workdir, "Data", "raw files")
+    os.makedirs(raw_dir)
+    # the project modules read their data directory and database when first imported
+    os.environ["CMCONNECT_DATA_DIR"] = workdir
+    os.environ["CMCONNECT_DATABASE_URL"] = args.url or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    try:
+        from synthetic_data import write_workbook
+        from normalization import run_normalization
+        from config_cloud import engine
+        from query_diagnostics import TIME_TOLERANCE, plan_regressions
+        scale = f"{engine.dialect.name}/{args.rows}"
+
+        t0 = time.perf_counter()
+        write_workbook(os.path.join(raw_dir, "synthetic.xlsx"), args.rows, 42)
+        if not run_normalization():
+            raise RuntimeError(f"Normalization failed; see logs in {workdir}")
+        print(f"{args.rows:,} EPS rows generated and loaded in {time.perf_counter() - t0:.1f} sec")
+
+        results = capture(args.repeat)
+        for label, result in results.items():
+            print(f"  {label:<60} {result.get('execution_ms') or 0:>9.2f} ms  {result.get('error', '')}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+
+    if args.update_baseline:
+        baseline[scale] = {label: {k: v for k, v in result.items() if k != "plan"} for label, result in results.items()}
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline for {scale} written to {BASELINE_PATH}")
+        return 0
+
+    if scale not in baseline:
+        print(f"No baseline for {scale} yet; run again with --update-baseline to record one.")
+        return 0
+
+    tolerance = TIME_TOLERANCE if args.tolerance is None else args.tolerance
+    found = plan_regressions(baseline[scale], results, tolerance=None)
+    slower = [line for line in plan_regressions(baseline[scale], results, tolerance) if line not in found]
+    for line in slower:
+        print(f"WARNING {line}")
+    for line in found:
+        print(f"REGRESSION {line}")
+    if found:
+        return 1
+    print(f"Same plans as the baseline{'' if slower else f', no query slower by more than {tolerance:.0%}'}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""
+Compare the Nodal Officer table renderer against the previous one
+(one Paragraph per cell via iterrows, one giant Table).
+
+    python benchmarks/bench_render.py --rows 5000
+
+Renders to an in-memory PDF; no database is needed.
+"""
+import argparse
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault("CMCONNECT_DATABASE_URL", "sqlite://")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+from reportlab.lib.pagesizes import A3, landscape  # noqa: E402
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Table  # noqa: E402
+
+import generate_pdf  # noqa: E402
+from report_styles import NODAL_OFFICER_TABLE_STYLE, get_styles, register_fonts  # noqa: E402
+
+
+def make_frame(rows, seed=11):
+    rng = np.random.default_rng(seed)
+    departments = [f"Department of {w} Affairs" for w in ("Health", "Education", "Power", "Water", "Rural Development")]
+    officers = [f"Nodal Officer {i}, Directorate of Something Quite Long {i % 7}" for i in range(200)]
+    return pd.DataFrame({
+        "Department Name": [f"{departments[i % 5]} {i}" for i in range(rows)],
+        "Total Ticket": rng.integers(10, 5000, rows),
+        "Pending Ticket": rng.integers(0, 2000, rows),
+        "Closed Ticket": rng.integers(0, 3000, rows),
+        "Pending With Nodal Officer": rng.choice(officers, rows),
+        "Nodal Officer Pending Count": rng.integers(0, 500, rows),
+    })
+
+
+def wrap_style():
+    return get_styles()["WrapStyle"]
+
+
+def legacy_flowables(df):
+    style = wrap_style()
+    table_data = [[Paragraph(f"<b>{col}</b>", style) for col in df.columns]]
+    for _, row in df.iterrows():
+        table_data.append([Paragraph(str(cell), style) for cell in row])
+    usable_width = landscape(A3)[0] * 0.8
+    col_lengths = [df[col].astype(str).head(30).map(len).mean() + len(col) for col in df.columns]
+    total = sum(col_lengths)
+    col_widths = [usable_width * (length / total) for length in col_lengths]
+    table = Table(table_data, colWidths=col_widths, repeatRows=1, hAlign='CENTER')
+    table.setStyle(NODAL_OFFICER_TABLE_STYLE)
+    return [table]
+
+
+def fast_flowables(df):
+    usable_width = landscape(A3)[0] * 0.8
+    measured = generate_pdf.measure_columns(df)
+    col_widths = generate_pdf.measure_col_widths(df, usable_width, measured)
+    return generate_pdf.build_tables(df, col_widths, wrap_style(), measured)
+
+
+def run(label, build, df):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    flowables = build(df)
+    t1 = time.perf_counter()
+    SimpleDocTemplate(io.BytesIO(), pagesize=landscape(A3)).build(flowables)
+    t2 = time.perf_counter()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{label:>8}: flowables {t1 - t0:7.2f} sec  build {t2 - t1:7.2f} sec  "
+          f"total {t2 - t0:7.2f} sec  peak {peak / 2**20:7.1f} MiB")
+    return t2 - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000)
+    args = parser.parse_args()
+
+    register_fonts()
+    df = make_frame(args.rows)
+    legacy = run("legacy", legacy_flowables, df)
+    fast = run("fast", fast_flowables, df)
+    print(f"speedup: {legacy / fast:.2f}x for {args.rows} rows")
+
+
+if __name__ == "__main__":
+    main()
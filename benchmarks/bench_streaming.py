@@ -0,0 +1,98 @@
+"""
+Peak memory of the Nodal Officer PDF built from a large query result, in
+memory (stream=False) versus streamed (stream=True), and of the CSV and
+Excel exports of the same rows (report_export.py).
+
+    python benchmarks/bench_streaming.py --rows 500,20000,100000
+
+Every run is a fresh process against a throwaway SQLite database (or --url)
+holding a table of `rows` report rows; the generator's SQL file is pointed at
+that table, so the bundled report queries are not involved.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+
+def child(rows, mode):
+    import numpy as np
+    import pandas as pd
+    from sqlalchemy import inspect
+
+    import analytics
+    import generate_pdf
+    import report_export
+    from config_cloud import DATA_ROOT, engine
+    from metrics import peak_rss_mb
+
+    table = f"bench_report_{rows}"
+    if not inspect(engine).has_table(table):
+        rng = np.random.default_rng(3)
+        pd.DataFrame({
+            "Department Name": [f"Department {i:07d}" for i in range(rows)],
+            "Total Ticket": rng.integers(10, 5000, rows),
+            "Pending Ticket": rng.integers(0, 2000, rows),
+            "Closed Ticket": rng.integers(0, 3000, rows),
+            "Pending With Nodal Officer": rng.choice([f"Nodal Officer {i}" for i in range(200)], rows),
+            "Nodal Officer Pending Count": rng.integers(0, 500, rows),
+        }).to_sql(table, engine, index=False, chunksize=20000)
+
+    sql_path = os.path.join(DATA_ROOT, f"{table}.sql")
+    with open(sql_path, "w") as f:
+        f.write(f'SELECT * FROM {table} ORDER BY "Department Name"')
+    generate_pdf.SQL_QUERY_PATH1 = generate_pdf.SQL_SUMMARY_PATH1 = sql_path
+    report_export.EXPORTS["nodal_officer"] = (sql_path, sql_path) + report_export.EXPORTS["nodal_officer"][2:]
+    analytics.aggregates_ready = lambda con: False
+
+    before = peak_rss_mb()
+    t0 = time.perf_counter()
+    if mode in ("csv", "xlsx"):
+        output = report_export.export_report("nodal_officer", mode, source="database")
+    else:
+        output = generate_pdf.generate_pdf_from_sql(source="database", stream=mode == "stream")
+    return {
+        "ok": bool(output),
+        "wall_s": round(time.perf_counter() - t0, 2),
+        "rss_before_mb": before,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", default="500,20000,100000")
+    parser.add_argument("--url", help="database URL (default: a throwaway SQLite file)")
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child(int(args.child[0]), args.child[1])))
+        return 0
+
+    workdir = tempfile.mkdtemp(prefix="cmconnect_stream_")
+    env = dict(os.environ, CMCONNECT_DATA_DIR=workdir,
+               CMCONNECT_DATABASE_URL=args.url or f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+    try:
+        print(f"{'rows':>8}  {'mode':<7} {'sec':>7}  {'RSS growth MB':>13}")
+        for rows in [int(r) for r in args.rows.split(",")]:
+            for mode in ("memory", "stream", "csv", "xlsx"):
+                out = subprocess.run([sys.executable, __file__, "--child", str(rows), mode],
+                                     env=env, check=True, capture_output=True, text=True).stdout
+                result = json.loads(out.strip().splitlines()[-1])
+                growth = result["peak_rss_mb"] - result["rss_before_mb"]
+                print(f"{rows:>8,}  {mode:<7} {result['wall_s']:>7.1f}  {growth:>13.1f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""
+End-to-end benchmark: normalization and both report generators on synthetic exports.
+
+    python benchmarks/run_benchmarks.py --rows 10000,100000
+    python benchmarks/run_benchmarks.py --rows 10000,100000 --update-baseline
+    python benchmarks/run_benchmarks.py --url postgresql+psycopg2://user:pw@localhost/bench
+
+For every scale a workbook is generated (see synthetic_data.py), copied into a
+throwaway data directory (CMCONNECT_DATA_DIR) and loaded into a fresh database
+(an SQLite file unless --url is given; the Postgres database is overwritten).
+Each pipeline runs in its own process so peak RSS is measured per pipeline.
+
+Results are compared with benchmarks/baseline.json: the run fails (exit code 1)
+when wall time or peak RSS grows, or throughput drops, by more than
+--tolerance. Baselines are machine specific; refresh them with
+--update-baseline after intentional changes or on new hardware.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+PIPELINES = ["normalization", "report_nodal_officer", "report_pending_summary"]
+TOLERANCE = 0.25
+
+
+# ======================================================
+# Child process: run one pipeline against the prepared data dir
+# ======================================================
+def run_pipeline(pipeline):
+    from metrics import peak_rss_mb
+
+    t0 = time.perf_counter()
+    if pipeline == "normalization":
+        from normalization import run_normalization
+        ok = run_normalization()
+    elif pipeline == "report_nodal_officer":
+        from generate_pdf import generate_pdf_from_sql
+        ok = generate_pdf_from_sql()
+    else:
+        from report_pdf import generate_pdf2_from_sql
+        ok = generate_pdf2_from_sql()
+    wall = time.perf_counter() - t0
+
+    return {"ok": bool(ok), "wall_s": round(wall, 3), "peak_rss_mb": peak_rss_mb()}
+
+
+def child_main(pipeline, out_path):
+    result = run_pipeline(pipeline)
+    with open(out_path, "w") as f:
+        json.dump(result, f)
+
+
+# ======================================================
+# Parent: prepare data, spawn pipelines, compare with the baseline
+# ======================================================
+def spawn(pipeline, data_dir, url):
+    out_path = os.path.join(data_dir, f"{pipeline}.json")
+    env = dict(os.environ, CMCONNECT_DATA_DIR=data_dir, CMCONNECT_DATABASE_URL=url)
+    subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", pipeline, "--child-out", out_path],
+        env=env, check=True, stdout=subprocess.DEVNULL,
+    )
+    with open(out_path) as f:
+        return json.load(f)
+
+
+def run_scale(rows, workdir, url=None, seed=42):
+    from synthetic_data import write_workbook
+
+    workbook = os.path.join(workdir, f"synthetic_{rows}.xlsx")
+    if not os.path.exists(workbook):
+        t0 = time.perf_counter()
+        write_workbook(workbook, rows, seed)
+        print(f"  generated {rows:,} rows in {time.perf_counter() - t0:.1f} sec")
+
+    data_dir = os.path.join(workdir, f"run_{rows}")
+    shutil.rmtree(data_dir, ignore_errors=True)
+    raw_dir = os.path.join(data_dir, "Data", "raw files")
+    os.makedirs(raw_dir)
+    shutil.copy(workbook, raw_dir)
+    url = url or f"sqlite:///{os.path.join(data_dir, 'bench.db')}"
+
+    results = {}
+    for pipeline in PIPELINES:
+        result = spawn(pipeline, data_dir, url)
+        if not result.pop("ok"):
+            raise RuntimeError(f"{pipeline} failed at {rows:,} rows; see logs in {data_dir}")
+        result["rows_per_s"] = round(rows / result["wall_s"]) if result["wall_s"] else None
+        results[pipeline] = result
+        print(f"  {pipeline:<24} {result['wall_s']:>8.2f} sec  {result['rows_per_s'] or 0:>9,} rows/sec  "
+              f"peak RSS {result['peak_rss_mb'] or 0:>7.1f} MB")
+    return results
+
+
+def regressions(results, baseline, tolerance=TOLERANCE):
+    """Human readable list of metrics that got worse than the baseline by more than `tolerance`."""
+    found = []
+    for scale, pipelines in results.items():
+        for pipeline, current in pipelines.items():
+            base = baseline.get(scale, {}).get(pipeline)
+            if not base:
+                continue
+            for metric, higher_is_worse in (("wall_s", True), ("peak_rss_mb", True), ("rows_per_s", False)):
+                old, new = base.get(metric), current.get(metric)
+                if not old or new is None:
+                    continue
+                change = (new - old) / old
+                if (change if higher_is_worse else -change) > tolerance:
+                    found.append(f"{scale} rows / {pipeline}: {metric} {old} -> {new} ({change:+.0%})")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", default="10000,100000", help="comma separated EPS row counts")
+    parser.add_argument("--url", help="database URL (default: a fresh SQLite file per scale)")
+    parser.add_argument("--workdir", help="where workbooks and run data go (default: a temp dir)")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--child", choices=PIPELINES, help=argparse.SUPPRESS)
+    parser.add_argument("--child-out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child_main(args.child, args.child_out)
+        return 0
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="cmconnect_bench_")
+    os.makedirs(workdir, exist_ok=True)
+    results = {}
+    for rows in [int(r) for r in args.rows.split(",")]:
+        print(f"{rows:,} EPS rows")
+        results[str(rows)] = run_scale(rows, workdir, args.url)
+    if not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+
+    if args.update_baseline:
+        baseline.update(results)
+        baseline["_machine"] = {
+            "recorded": datetime.now().isoformat(timespec="seconds"),
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+        }
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {BASELINE_PATH}")
+        return 0
+
+    if not baseline:
+        print("No baseline yet; run again with --update-baseline to record one.")
+        return 0
+
+    found = regressions(results, baseline, args.tolerance)
+    for line in found:
+        print(f"REGRESSION {line}")
+    if found:
+        return 1
+    print(f"No regressions beyond {args.tolerance:.0%} of the baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
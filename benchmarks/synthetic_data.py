@@ -0,0 +1,158 @@
+"""
+Write a synthetic EPS/CRM export with the sheet layout run_normalization expects.
+
+    python benchmarks/synthetic_data.py --rows 100000 --out "Data/raw files/synthetic_100k.xlsx"
+
+District, block, department, category, status and officer values follow
+skewed (Zipf-like) distributions so a few departments and officers carry
+most of the load, as in the real exports.
+"""
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from openpyxl import Workbook
+
+DISTRICTS = {
+    "East Khasi Hills": ["Mylliem", "Mawphlang", "Mawryngkneng", "Pynursla", "Shella Bholaganj"],
+    "West Garo Hills": ["Tura", "Dadenggre", "Selsella", "Rongram", "Gambegre"],
+    "Ri-Bhoi": ["Umsning", "Umling", "Jirang", "Bhoirymbong"],
+    "West Jaintia Hills": ["Thadlaskein", "Laskein", "Amlarem"],
+    "East Garo Hills": ["Resubelpara", "Songsak", "Dambo Rongjeng"],
+    "South West Khasi Hills": ["Mawkyrwat", "Ranikor"],
+    "West Khasi Hills": ["Nongstoin", "Mairang", "Mawshynrut"],
+    "South Garo Hills": ["Chokpot", "Baghmara"],
+    "North Garo Hills": ["Resubelpara", "Kharkutta"],
+    "East Jaintia Hills": ["Khliehriat", "Saipung"],
+    "Eastern West Khasi Hills": ["Mawthadraishan"],
+    "South West Garo Hills": ["Zikzak", "Betasing"],
+}
+
+DEPARTMENTS = [
+    "Power", "Public Health Engineering", "Public Works (Roads)", "Health & Family Welfare",
+    "Education", "Community & Rural Development", "Food, Civil Supplies & Consumer Affairs",
+    "Revenue & Disaster Management", "Social Welfare", "Urban Affairs", "Agriculture",
+    "Home (Police)", "Transport", "Forest & Environment", "Labour", "Taxation",
+    "Personnel & AR", "Soil & Water Conservation", "Fisheries", "Information Technology",
+]
+
+CATEGORIES = [
+    "Road Repair", "Water Supply", "Electricity Supply", "Pension", "Scholarship",
+    "Ration Card", "Land Records", "Hospital Services", "Teacher Shortage", "Street Lights",
+    "MGNREGA Wages", "Housing Scheme", "Drainage", "Police Complaint", "Bus Services",
+    "Certificate Issuance", "Tree Felling", "Compensation", "Crop Insurance", "Internet Connectivity",
+]
+
+BLOCK_SUFFIXES = [" C & RD Block", " C&RD Block", " c & rd block", "", " C & RD  Block"]
+SOURCES = ["CM Connect Portal", "Call Centre", "Mobile App", "Walk-in", "Email"]
+CALL_STATUSES = ["Reached", "Not Reachable", "Switched Off", "Call Back Later", "Wrong Number"]
+FEEDBACK = ["Satisfied", "Not Satisfied", "Partially Satisfied", None]
+
+EPS_HEADER = [
+    "Grievance ID", "Date of Complaint", "District", "Block", "Source", "Source1",
+    "Status", "New Department", "New Category", "Ticket Currently Pending With", " ",
+]
+CRM_HEADER = ["Grievance ID", "Call Date", "Call Status", "Citizen Feedback", "Remarks"]
+
+
+def zipf_weights(n, skew=1.1):
+    weights = 1.0 / np.arange(1, n + 1) ** skew
+    return weights / weights.sum()
+
+
+def officers_for(departments, per_department=15):
+    return {
+        dept: [f"{dept.split()[0]} Nodal Officer {i + 1} " for i in range(per_department)]
+        for dept in departments
+    }
+
+
+def eps_rows(rows, rng):
+    districts = list(DISTRICTS)
+    district_idx = rng.choice(len(districts), rows, p=zipf_weights(len(districts), 0.8))
+    dept_idx = rng.choice(len(DEPARTMENTS), rows, p=zipf_weights(len(DEPARTMENTS)))
+    cat_idx = rng.choice(len(CATEGORIES), rows, p=zipf_weights(len(CATEGORIES), 0.9))
+    officer_idx = rng.choice(15, rows, p=zipf_weights(15, 1.3))
+    pending = rng.random(rows) < 0.35
+    in_progress = rng.random(rows) < 0.05
+    days = rng.integers(0, 730, rows)
+    suffix_idx = rng.integers(0, len(BLOCK_SUFFIXES), rows)
+    block_pick = rng.integers(0, 10, rows)
+    source_idx = rng.choice(len(SOURCES), rows, p=zipf_weights(len(SOURCES)))
+    officers = officers_for(DEPARTMENTS)
+    start = datetime(2023, 1, 1)
+
+    for i in range(rows):
+        district = districts[district_idx[i]]
+        blocks = DISTRICTS[district]
+        department = DEPARTMENTS[dept_idx[i]]
+        status = "Pending" if pending[i] else ("In Progress" if in_progress[i] else "Closed")
+        officer = officers[department][officer_idx[i]]
+        yield [
+            f"CMC/{2023 + days[i] // 365}/{i + 1:08d}",
+            start + timedelta(days=int(days[i])),
+            district,
+            blocks[block_pick[i] % len(blocks)] + BLOCK_SUFFIXES[suffix_idx[i]],
+            SOURCES[source_idx[i]],
+            SOURCES[(source_idx[i] + 1) % len(SOURCES)],
+            status,
+            department,
+            CATEGORIES[cat_idx[i]],
+            officer,
+            officer.strip(),
+        ]
+
+
+def crm_rows(rows, rng):
+    called = rng.choice(rows, size=rows // 2, replace=False)
+    called.sort()
+    status_idx = rng.choice(len(CALL_STATUSES), len(called), p=zipf_weights(len(CALL_STATUSES)))
+    feedback_idx = rng.integers(0, len(FEEDBACK), len(called))
+    days = rng.integers(0, 730, len(called))
+    start = datetime(2023, 1, 1)
+    for j, i in enumerate(called):
+        yield [
+            f"CMC/{2023 + days[j] // 365}/{i + 1:08d}",
+            start + timedelta(days=int(days[j])),
+            CALL_STATUSES[status_idx[j]],
+            FEEDBACK[feedback_idx[j]],
+            f"Follow-up call {j + 1}",
+        ]
+
+
+def write_workbook(path, rows, seed=42):
+    """Write an 'EPS RAW' sheet of `rows` grievances and a 'CRM RAW' sheet of follow-up calls."""
+    rng = np.random.default_rng(seed)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    workbook = Workbook(write_only=True)
+
+    eps = workbook.create_sheet("EPS RAW")
+    eps.append(EPS_HEADER)
+    for row in eps_rows(rows, rng):
+        eps.append(row)
+
+    crm = workbook.create_sheet("CRM RAW")
+    crm.append(CRM_HEADER)
+    for row in crm_rows(rows, rng):
+        crm.append(row)
+
+    workbook.save(path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000, help="EPS rows (10k to 2M)")
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    write_workbook(args.out, args.rows, args.seed)
+    print(f"Wrote {args.rows:,} EPS rows to {args.out} in {time.perf_counter() - t0:.1f} sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+import csv
+import io
+import time
+import logging
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import inspect, text
+
+# ======================================================
+# Pluggable bulk loaders for DataFrame.to_sql(method=...)
+# ======================================================
+# Rows per executemany batch on dialects without a native bulk path
+BATCH_SIZE = 5000
+
+
+def _qualified_name(table):
+    if table.schema:
+        return f'"{table.schema}"."{table.name}"'
+    return f'"{table.name}"'
+
+
+def copy_insert(table, conn, keys, data_iter):
+    """to_sql method for PostgreSQL: COPY FROM STDIN through an in-memory CSV buffer."""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(data_iter)
+    buffer.seek(0)
+
+    columns = ", ".join(f'"{k}"' for k in keys)
+    sql = f"COPY {_qualified_name(table)} ({columns}) FROM STDIN WITH (FORMAT csv)"
+
+    dbapi_conn = conn.connection
+    with dbapi_conn.cursor() as cur:
+        if hasattr(cur, "copy_expert"):
+            # psycopg2
+            cur.copy_expert(sql, buffer)
+        else:
+            # psycopg 3
+            with cur.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+
+
+# Dialect name -> to_sql method. Anything not listed falls back to
+# pandas' default executemany path in BATCH_SIZE batches.
+LOADERS = {
+    "postgresql": copy_insert,
+}
+
+
+def loader_for(con):
+    return LOADERS.get(con.dialect.name)
+
+
+def bulk_load(df, table, con, if_exists="append", dtype=None):
+    """Write `df` to `table` with the fastest loader for the dialect; returns elapsed seconds."""
+    method = loader_for(con)
+    t0 = time.perf_counter()
+    df.to_sql(
+        table,
+        con=con,
+        if_exists=if_exists,
+        index=False,
+        chunksize=None if method else BATCH_SIZE,
+        method=method,
+        dtype=dtype,
+    )
+    return time.perf_counter() - t0
+
+
+def log_throughput(table, rows, seconds):
+    rate = rows / seconds if seconds > 0 else float("inf")
+    logging.info(f"⬆️ {table}: {rows} rows uploaded in {seconds:.2f} sec ({rate:,.0f} rows/sec)")
+
+
+# ======================================================
+# Shadow tables, reporting indexes and the atomic swap
+# ======================================================
+# Columns the bundled report SQL filters, groups or joins on
+REPORT_INDEXES = {
+    "staging_grievance": [
+        "status",
+        "officer_id",
+        "department_id",
+        "category_id",
+        "district_id",
+        "grievance_id",
+    ],
+    "crm_raw": ["grievance_id"],
+}
+
+
+def index_name(table, column):
+    return f"ix_{table}_{column}"
+
+
+def build_indexes(con, table, columns, if_not_exists=False):
+    q = con.dialect.identifier_preparer.quote
+    guard = "IF NOT EXISTS " if if_not_exists else ""
+    t0 = time.perf_counter()
+    with con.begin() as conn:
+        for col in columns:
+            conn.execute(text(f"CREATE INDEX {guard}{q(index_name(table, col))} ON {q(table)} ({q(col)})"))
+    if columns:
+        logging.info(f"{table}: indexes on {', '.join(columns)} ready in {time.perf_counter() - t0:.2f} sec")
+
+
+def widen_to_text(con, table, column):
+    """Change `column` of `table` to TEXT, keeping the values loaded so far (SQLite takes text in any column)."""
+    q = con.dialect.identifier_preparer.quote
+    with con.begin() as conn:
+        if con.dialect.name == "postgresql":
+            conn.execute(text(f"ALTER TABLE {q(table)} ALTER COLUMN {q(column)} TYPE TEXT USING {q(column)}::text"))
+        elif con.dialect.name == "mysql":
+            conn.execute(text(f"ALTER TABLE {q(table)} MODIFY {q(column)} TEXT"))
+
+
+def swap_in(con, shadow, table, index_columns=()):
+    """
+    Replace `table` with the fully loaded and indexed `shadow` in one transaction.
+
+    Readers see either the previous table or the new one, never a partial load;
+    on PostgreSQL they only wait for the rename itself.
+    """
+    q = con.dialect.identifier_preparer.quote
+    with con.begin() as conn:
+        if con.dialect.name == "postgresql":
+            conn.execute(text("SET LOCAL lock_timeout = '60s'"))
+        conn.execute(text(f"DROP TABLE IF EXISTS {q(table)}"))
+        conn.execute(text(f"ALTER TABLE {q(shadow)} RENAME TO {q(table)}"))
+        for col in index_columns:
+            old, new = q(index_name(shadow, col)), q(index_name(table, col))
+            if con.dialect.name == "postgresql":
+                conn.execute(text(f"ALTER INDEX {old} RENAME TO {new}"))
+            else:
+                # SQLite cannot rename an index; it is rebuilt under the final name
+                conn.execute(text(f"DROP INDEX {old}"))
+                conn.execute(text(f"CREATE INDEX {new} ON {q(table)} ({q(col)})"))
+    logging.info(f"🔀 {shadow} swapped in as {table}")
+
+
+# ======================================================
+# Incremental (delta) apply keyed on grievance_id + row hash
+# ======================================================
+HASH_COLUMN = "row_hash"
+
+
+def row_hashes(df):
+    """Content fingerprint per row, stable whatever dtype a chunk happened to infer."""
+    canonical = {}
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            canonical[col] = series.astype("float64")
+        elif isinstance(series.dtype, pd.CategoricalDtype) and series.cat.categories.astype(str).is_unique:
+            # hashed once per category; same hashes as the string path below
+            series = series.cat.rename_categories(series.cat.categories.astype(str))
+            if "" not in series.cat.categories:
+                series = series.cat.add_categories([""])
+            canonical[col] = series.fillna("")
+        else:
+            canonical[col] = series.astype(str).where(series.notna(), "")
+    hashes = pd.util.hash_pandas_object(pd.DataFrame(canonical, index=df.index), index=False)
+    return hashes.to_numpy().view(np.int64)
+
+
+def _table_columns(con, table):
+    """{column: SQL type} of `table`, in table order; None if it does not exist."""
+    insp = inspect(con)
+    if not insp.has_table(table):
+        return None
+    return {c["name"]: str(c["type"]) for c in insp.get_columns(table)}
+
+
+def merge_delta(con, incoming, table, key="grievance_id"):
+    """
+    Bring `table` in line with `incoming` touching only grievances whose rows changed.
+
+    A grievance is re-written when any of its (key, row_hash) pairs is missing on
+    the other side. Rows without a key are always replaced. Returns a dict with
+    inserted/updated/deleted grievance counts, or None (nothing applied) when
+    `table` does not exist yet or its columns or their types differ (e.g. a
+    column loaded as text this time) and a full swap is needed.
+    """
+    q = con.dialect.identifier_preparer.quote
+    new_cols = _table_columns(con, incoming)
+    old_cols = _table_columns(con, table)
+
+    if key not in new_cols or HASH_COLUMN not in new_cols:
+        raise ValueError(f"{incoming} has no {key}/{HASH_COLUMN} columns to diff on.")
+    if old_cols is None or old_cols != new_cols:
+        logging.info(f"{table}: no compatible previous load, replacing the whole table")
+        return None
+
+    t, i, k, h = q(table), q(incoming), q(key), q(HASH_COLUMN)
+    delta = q(f"{incoming}_delta")
+    cols = ", ".join(q(c) for c in new_cols)
+
+    with con.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {delta}"))
+        conn.execute(text(f"CREATE INDEX {q(incoming + '_key_idx')} ON {i} ({k}, {h})"))
+        conn.execute(text(f"""
+            CREATE TABLE {delta} AS
+            SELECT o.{k} AS {k} FROM {t} o
+            WHERE o.{k} IS NOT NULL AND NOT EXISTS (
+                SELECT 1 FROM {i} n WHERE n.{k} = o.{k} AND n.{h} = o.{h})
+            UNION
+            SELECT n.{k} AS {k} FROM {i} n
+            WHERE n.{k} IS NOT NULL AND NOT EXISTS (
+                SELECT 1 FROM {t} o WHERE o.{k} = n.{k} AND o.{h} = n.{h})
+        """))
+
+        counts = conn.execute(text(f"""
+            SELECT
+                SUM(CASE WHEN NOT EXISTS (SELECT 1 FROM {t} o WHERE o.{k} = d.{k}) THEN 1 ELSE 0 END),
+                SUM(CASE WHEN NOT EXISTS (SELECT 1 FROM {i} n WHERE n.{k} = d.{k}) THEN 1 ELSE 0 END),
+                COUNT(*)
+            FROM {delta} d
+        """)).one()
+        inserted, deleted, changed = (int(c or 0) for c in counts)
+
+        conn.execute(text(f"DELETE FROM {t} WHERE {k} IN (SELECT {k} FROM {delta}) OR {k} IS NULL"))
+        conn.execute(text(f"""
+            INSERT INTO {t} ({cols})
+            SELECT {cols} FROM {i}
+            WHERE {k} IN (SELECT {k} FROM {delta}) OR {k} IS NULL
+        """))
+        conn.execute(text(f"DROP TABLE {delta}"))
+        conn.execute(text(f"DROP TABLE {i}"))
+
+    result = {"inserted": inserted, "updated": changed - inserted - deleted, "deleted": deleted}
+    logging.info(
+        f"🔁 {table}: {result['inserted']} inserted, {result['updated']} updated, "
+        f"{result['deleted']} deleted grievances"
+    )
+    return result
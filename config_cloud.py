@@ -6,37 +6,112 @@ from sqlalchemy import create_engine
 # CLOUD DATABASE CONFIG (FROM SECRETS)
 # ===============================
 
-DB_CONFIG = {
-    "dialect": st.secrets["DB_DIALECT"],  # ← FIX 1: use DBDIALECT from secrets.toml
-    "username": st.secrets["DB_USER"],
-    "password": st.secrets["DB_PASS"],
-    "host": st.secrets["DB_HOST"],
-    "port": st.secrets["DB_PORT"],
-    "database": st.secrets["DB_NAME"],
-}
-
-DATABASE_URL = (
-    f"{DB_CONFIG['dialect']}://{DB_CONFIG['username']}:{DB_CONFIG['password']}"
-    f"@{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}"
-)
-
-engine = create_engine(DATABASE_URL)
+# Local runs (benchmarks, a SQLite or local Postgres stand-in) can skip the
+# secrets entirely: CMCONNECT_DATABASE_URL=sqlite:///local.db
+DATABASE_URL = os.environ.get("CMCONNECT_DATABASE_URL")
+USE_SECRETS = not DATABASE_URL
+
+if USE_SECRETS:
+    DB_CONFIG = {
+        "dialect": st.secrets["DB_DIALECT"],  # ← FIX 1: use DBDIALECT from secrets.toml
+        "username": st.secrets["DB_USER"],
+        "password": st.secrets["DB_PASS"],
+        "host": st.secrets["DB_HOST"],
+        "port": st.secrets["DB_PORT"],
+        "database": st.secrets["DB_NAME"],
+    }
+
+    DATABASE_URL = (
+        f"{DB_CONFIG['dialect']}://{DB_CONFIG['username']}:{DB_CONFIG['password']}"
+        f"@{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}"
+    )
+
+
+# ===============================
+# CONNECTION POOLS
+# ===============================
+
+def db_setting(name, default):
+    """CMCONNECT_<name> environment variable, else <name> in secrets.toml, else `default`."""
+    value = os.environ.get(f"CMCONNECT_{name}")
+    if value is None and USE_SECRETS:
+        value = st.secrets.get(name)
+    if value is None:
+        return default
+    if isinstance(default, bool):
+        return str(value).strip().lower() in ("1", "true", "yes", "on")
+    return type(default)(value)
+
+
+# Report reads: a few warm connections shared by every session, checked with a
+# cheap ping before use and replaced before the server drops them as idle
+POOL_SIZE = db_setting("DB_POOL_SIZE", 5)
+MAX_OVERFLOW = db_setting("DB_MAX_OVERFLOW", 5)
+POOL_TIMEOUT = db_setting("DB_POOL_TIMEOUT", 30)
+POOL_RECYCLE = db_setting("DB_POOL_RECYCLE", 1800)
+POOL_PRE_PING = db_setting("DB_POOL_PRE_PING", True)
+# Server-side limit per statement in milliseconds (0 = none)
+REPORT_STATEMENT_TIMEOUT_MS = db_setting("DB_REPORT_STATEMENT_TIMEOUT_MS", 120000)
+
+# Bulk ingest: one load runs at a time; index builds and swaps can take long
+INGEST_POOL_SIZE = db_setting("DB_INGEST_POOL_SIZE", 2)
+INGEST_STATEMENT_TIMEOUT_MS = db_setting("DB_INGEST_STATEMENT_TIMEOUT_MS", 0)
+
+
+def make_engine(pool_size, max_overflow, statement_timeout_ms):
+    options = {}
+    connect_args = {}
+    if not DATABASE_URL.startswith("sqlite"):
+        options = dict(pool_size=pool_size, max_overflow=max_overflow, pool_timeout=POOL_TIMEOUT,
+                       pool_recycle=POOL_RECYCLE, pool_pre_ping=POOL_PRE_PING)
+    if statement_timeout_ms and DATABASE_URL.startswith("postgresql"):
+        connect_args["options"] = f"-c statement_timeout={statement_timeout_ms}"
+    elif statement_timeout_ms and DATABASE_URL.startswith("mysql"):
+        connect_args["init_command"] = f"SET SESSION max_execution_time={statement_timeout_ms}"
+    return create_engine(DATABASE_URL, connect_args=connect_args, **options)
+
+
+report_engine = make_engine(POOL_SIZE, MAX_OVERFLOW, REPORT_STATEMENT_TIMEOUT_MS)
+ingest_engine = make_engine(INGEST_POOL_SIZE, 0, INGEST_STATEMENT_TIMEOUT_MS)
+# Existing callers read reports through `engine`
+engine = report_engine
+
+
+def pool_status():
+    """Connection counts of both pools, for the app's metrics page."""
+    status = {}
+    for name, pooled in (("report", report_engine), ("ingest", ingest_engine)):
+        pool = pooled.pool
+        status[name] = {
+            "pool": type(pool).__name__,
+            "size": pool.size() if hasattr(pool, "size") else None,
+            "checked_out": pool.checkedout() if hasattr(pool, "checkedout") else None,
+            "idle": pool.checkedin() if hasattr(pool, "checkedin") else None,
+            "overflow": pool.overflow() if hasattr(pool, "overflow") else None,
+        }
+    return status
 
 # ===============================
 # DIRECTORIES THAT EXIST IN STREAMLIT CLOUD
 # ===============================
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Data, logs and reports can live elsewhere for local runs (CMCONNECT_DATA_DIR)
+DATA_ROOT = os.environ.get("CMCONNECT_DATA_DIR", BASE_DIR)
 
-RAW_DATA_PATH = os.path.join(BASE_DIR, "Data", "raw files")
-PROCESSED_PATH = os.path.join(BASE_DIR, "Data", "Processed files")
-LOG_DIR = os.path.join(BASE_DIR, "logs")
-REPORT_PATH = os.path.join(BASE_DIR, "Reports")
+RAW_DATA_PATH = os.path.join(DATA_ROOT, "Data", "raw files")
+PROCESSED_PATH = os.path.join(DATA_ROOT, "Data", "Processed files")
+LOG_DIR = os.path.join(DATA_ROOT, "logs")
+REPORT_PATH = os.path.join(DATA_ROOT, "Reports")
 PICTURE_PATH = os.path.join(BASE_DIR, "fonts", "Picture1.png")
 
 SQL_QUERY_PATH1 = os.path.join(BASE_DIR, "Sqlqueries", "NodalOfficersqlQueries.sql")
 SQL_QUERY_PATH2 = os.path.join(BASE_DIR, "Sqlqueries", "NodalAnalysisReport.sql")
 
+# Same reports read from the aggregate tables normalization builds
+SQL_SUMMARY_PATH1 = os.path.join(BASE_DIR, "Sqlqueries", "NodalOfficerSummary.sql")
+SQL_SUMMARY_PATH2 = os.path.join(BASE_DIR, "Sqlqueries", "NodalAnalysisSummary.sql")
+
 FONT_PATH = os.path.join(BASE_DIR, "fonts", "Candara.ttf")
 
 # Create folders if missing
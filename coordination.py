@@ -0,0 +1,175 @@
+import inspect
+import json
+import os
+import shutil
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import datetime
+from load_metadata import current_data_version
+from report_filters import filter_key
+from config_cloud import *
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+# ======================================================
+# Coordination between sessions (and processes) sharing one data directory
+# ======================================================
+LOCK_DIR = os.path.join(PROCESSED_PATH, "locks")
+LOCK_POLL_SECONDS = 1.0
+# Staged uploads older than this are removed after the next successful load
+UPLOAD_TTL_HOURS = 24
+
+os.makedirs(LOCK_DIR, exist_ok=True)
+
+
+# ------------------------------------------------------
+# Ingest lock
+# ------------------------------------------------------
+def _try_lock(f):
+    try:
+        if os.name == "nt":
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+
+def _unlock(f):
+    if os.name == "nt":
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+@contextmanager
+def ingest_lock(on_wait=None, name="ingest"):
+    """
+    Exclusive lock held across threads and processes while a load replaces
+    the tables. Blocks until it is free; `on_wait()` is called once if it has
+    to wait. The OS releases it if the holder dies.
+    """
+    with open(os.path.join(LOCK_DIR, f"{name}.lock"), "a+") as f:
+        waited = time.perf_counter()
+        if not _try_lock(f):
+            logging.info(f"⏳ Waiting for the {name} lock held by another load...")
+            if on_wait:
+                on_wait()
+            while not _try_lock(f):
+                time.sleep(LOCK_POLL_SECONDS)
+            logging.info(f"🔓 {name} lock acquired after {time.perf_counter() - waited:.1f} sec")
+        try:
+            yield
+        finally:
+            _unlock(f)
+
+
+# ------------------------------------------------------
+# Per-upload staging directories
+# ------------------------------------------------------
+def stage_upload(file_name, data):
+    """Save an uploaded workbook in a directory of its own; returns its path."""
+    upload_dir = os.path.join(RAW_DATA_PATH, f"upload_{datetime.now():%Y%m%d_%H%M%S}_{uuid.uuid4().hex[:8]}")
+    os.makedirs(upload_dir)
+    path = os.path.join(upload_dir, os.path.basename(file_name))
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+def latest_workbook():
+    """Newest .xlsx in RAW_DATA_PATH or one of its upload directories."""
+    candidates = []
+    for root, dirs, files in os.walk(RAW_DATA_PATH):
+        candidates += [os.path.join(root, f) for f in files if f.endswith(".xlsx")]
+        if root != RAW_DATA_PATH:
+            dirs.clear()
+    if not candidates:
+        raise FileNotFoundError("No Excel files found.")
+    return max(candidates, key=os.path.getmtime)
+
+
+def prune_uploads(keep_path=None, ttl_hours=UPLOAD_TTL_HOURS):
+    """Remove upload directories older than `ttl_hours`, except the one holding `keep_path`."""
+    keep_dir = os.path.dirname(os.path.abspath(keep_path)) if keep_path else None
+    cutoff = time.time() - ttl_hours * 3600
+    for name in os.listdir(RAW_DATA_PATH):
+        path = os.path.join(RAW_DATA_PATH, name)
+        if (name.startswith("upload_") and os.path.isdir(path) and path != keep_dir
+                and os.path.getmtime(path) < cutoff):
+            shutil.rmtree(path, ignore_errors=True)
+            logging.info(f"🗑️ Staged upload removed: {name}")
+
+
+# ------------------------------------------------------
+# Single-flight report runs
+# ------------------------------------------------------
+class SingleFlight:
+    """Concurrent calls with the same key share one execution and its result (or exception)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.counters = {"runs": 0, "shared": 0}
+
+    def do(self, key, fn, *args, on_wait=None, **kwargs):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+            self.counters["runs" if leader else "shared"] += 1
+
+        if not leader:
+            if on_wait:
+                on_wait()
+            return future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+report_flights = SingleFlight()
+
+
+def report_key(generate, kwargs):
+    """Identity of a report request: generator, data version and every argument with defaults filled in."""
+    call = inspect.signature(generate).bind_partial(**kwargs)
+    call.apply_defaults()
+    arguments = {name: value for name, value in call.arguments.items() if name != "progress"}
+    if "filters" in arguments:
+        arguments["filters"] = filter_key(arguments["filters"])
+    return (generate.__module__, generate.__name__, current_data_version(),
+            json.dumps(arguments, sort_keys=True, default=str))
+
+
+def run_report(generate, progress=None, **kwargs):
+    """
+    generate(progress=progress, **kwargs), shared with any identical request
+    (same generator, arguments and data version) already running.
+    """
+    key = report_key(generate, kwargs)
+    wait = (lambda: progress(None, "Waiting for an identical report that is already being generated...")) \
+        if progress else None
+    if progress:
+        kwargs["progress"] = progress
+    return report_flights.do(key, generate, on_wait=wait, **kwargs)
@@ -0,0 +1,35 @@
+"""
+Layout of the dimension tables, without pandas or the loaders: the app reads
+it to build its filter widgets (dimensions.py fills the tables).
+"""
+
+# ======================================================
+# Dimension tables: staging_grievance stores integer keys, names live here
+# ======================================================
+# staging_grievance column -> (dimension table, key column, name column)
+DIMENSIONS = {
+    "ticket_currently_pending_with": ("dim_officer", "officer_id", "officer"),
+    "new_department": ("dim_department", "department_id", "department"),
+    "new_category": ("dim_category", "category_id", "category"),
+    "district": ("dim_district", "district_id", "district"),
+    "block": ("dim_block", "block_id", "block"),
+}
+DIMENSION_TABLES = [table for table, _, _ in DIMENSIONS.values()]
+
+# staging_grievance with the names joined back, in the column layout of the
+# Parquet snapshot (what the pandas engine and the parity check work on)
+NAMED_GRIEVANCES_SQL = """
+    SELECT
+        g.grievance_id,
+        g.status,
+        dp.department AS new_department,
+        c.category AS new_category,
+        o.officer AS ticket_currently_pending_with,
+        d.district,
+        g.date_of_complaint
+    FROM staging_grievance g
+    LEFT JOIN dim_department dp ON dp.department_id = g.department_id
+    LEFT JOIN dim_category c ON c.category_id = g.category_id
+    LEFT JOIN dim_officer o ON o.officer_id = g.officer_id
+    LEFT JOIN dim_district d ON d.district_id = g.district_id
+"""
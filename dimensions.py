@@ -0,0 +1,62 @@
+import logging
+import numpy as np
+import pandas as pd
+from sqlalchemy import Integer, Text, inspect, text
+from bulk_loader import build_indexes, bulk_load, swap_in
+from dimension_tables import DIMENSIONS
+
+
+class Dimensions:
+    """
+    Name -> key catalogs of the dimension columns, filled chunk by chunk during a
+    load. Keys are seeded from the published dimension tables, so a value keeps
+    its key from one load to the next (incremental loads compare rows by hash,
+    keys included) and the tables only ever grow.
+    """
+
+    def __init__(self, con):
+        self.catalogs = {column: {} for column in DIMENSIONS}
+        insp = inspect(con)
+        for column, (table, key, name) in DIMENSIONS.items():
+            if insp.has_table(table):
+                with con.connect() as conn:
+                    rows = conn.execute(text(f"SELECT {key}, {name} FROM {table}"))
+                    self.catalogs[column] = {value: int(k) for k, value in rows}
+        self.seeded = {column: len(catalog) for column, catalog in self.catalogs.items()}
+
+    def keys_for(self, column, values):
+        """Keys of `values` (distinct names), adding the ones not seen yet."""
+        catalog = self.catalogs[column]
+        for value in values:
+            if value not in catalog:
+                catalog[value] = len(catalog) + 1
+        return np.array([catalog[value] for value in values], dtype=np.int32)
+
+    def encode(self, df):
+        """Copy of a cleaned chunk with each dimension column replaced by its key column."""
+        df = df.rename(columns={column: DIMENSIONS[column][1] for column in DIMENSIONS if column in df.columns})
+        for column, (_, key, _) in DIMENSIONS.items():
+            if key not in df.columns:
+                continue
+            series = df[key]
+            if not isinstance(series.dtype, pd.CategoricalDtype):
+                series = series.astype("category")
+            # one lookup per distinct value, then a vectorised take over the codes
+            # (code -1, a NULL, picks the trailing 0 and is masked below)
+            keys = np.append(self.keys_for(column, list(series.cat.categories)), 0)
+            codes = series.cat.codes.to_numpy()
+            encoded = pd.array(keys[codes], dtype="Int32")
+            encoded[codes < 0] = pd.NA
+            df[key] = encoded
+        return df
+
+    def publish(self, con):
+        """Write every dimension table (shadow copy, indexed, swapped in)."""
+        for column, (table, key, name) in DIMENSIONS.items():
+            catalog = self.catalogs[column]
+            frame = pd.DataFrame({key: list(catalog.values()), name: list(catalog.keys())})
+            shadow = f"{table}_shadow"
+            bulk_load(frame, shadow, con, if_exists="replace", dtype={key: Integer(), name: Text()})
+            build_indexes(con, shadow, [key, name])
+            swap_in(con, shadow, table, [key, name])
+            logging.info(f"{table}: {len(catalog)} values ({len(catalog) - self.seeded[column]} new)")
@@ -0,0 +1,86 @@
+import hashlib
+import posixpath
+import zipfile
+from xml.etree.ElementTree import iterparse
+
+# ======================================================
+# Content fingerprints of uploaded workbooks
+# ======================================================
+MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+PKG_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+# Sheets hashed before loading so an unchanged one can be skipped. EPS RAW
+# changes with every export, so hashing it up front would only add work.
+SHEET_PRECHECK = ("CRM RAW",)
+
+# shared, inline and formula strings hash alike
+STRING_KINDS = {"s", "inlineStr", "str"}
+
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def sheet_parts(archive):
+    """Sheet name -> worksheet XML part inside the xlsx archive."""
+    with archive.open("xl/_rels/workbook.xml.rels") as f:
+        targets = {
+            el.get("Id"): el.get("Target")
+            for _, el in iterparse(f) if el.tag == PKG_REL_NS + "Relationship"
+        }
+    parts = {}
+    with archive.open("xl/workbook.xml") as f:
+        for _, el in iterparse(f):
+            if el.tag == MAIN_NS + "sheet":
+                target = targets[el.get(REL_NS + "id")]
+                # targets are usually relative to xl/, some writers make them absolute
+                parts[el.get("name")] = target.lstrip("/") if target.startswith("/") else posixpath.join("xl", target)
+    return parts
+
+
+def shared_strings(archive):
+    if "xl/sharedStrings.xml" not in archive.namelist():
+        return []
+    strings = []
+    with archive.open("xl/sharedStrings.xml") as f:
+        for _, el in iterparse(f):
+            if el.tag == MAIN_NS + "si":
+                strings.append("".join(el.itertext()))
+                el.clear()
+    return strings
+
+
+def sheet_digest(archive, part, strings):
+    """
+    Hash of every cell's reference, type and value, with shared strings
+    resolved so the digest does not depend on how the rest of the workbook
+    numbered them. Styles are ignored.
+    """
+    digest = hashlib.sha256()
+    with archive.open(part) as f:
+        for _, el in iterparse(f):
+            if el.tag == MAIN_NS + "c":
+                kind = el.get("t")
+                value = "".join(el.itertext())
+                if kind == "s" and value:
+                    value = strings[int(value)]
+                if kind in STRING_KINDS:
+                    kind = "str"
+                digest.update(f"{el.get('r')}|{kind}|{value}\x00".encode())
+            elif el.tag == MAIN_NS + "row":
+                el.clear()
+    return digest.hexdigest()
+
+
+def sheet_digests(path, sheets=SHEET_PRECHECK):
+    """{sheet name: digest} for the given sheets that exist in the workbook."""
+    with zipfile.ZipFile(path) as archive:
+        parts = sheet_parts(archive)
+        wanted = [name for name in sheets if name in parts]
+        strings = shared_strings(archive) if wanted else []
+        return {name: sheet_digest(archive, parts[name], strings) for name in wanted}
@@ -1,16 +1,21 @@
 import os
+import uuid
+import itertools
 import pandas as pd
-from sqlalchemy import text
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4, A3, landscape, portrait
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.pagesizes import A3, landscape
+from reportlab.platypus import SimpleDocTemplate, Table, Paragraph, Spacer
 from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.platypus import Paragraph
-from reportlab.lib.enums import TA_CENTER
 from datetime import datetime
+from xml.sax.saxutils import escape
 import logging
+from analytics import fetch_report, stream_report
+from jobs import no_progress, render_progress
+from metrics import instrumented, stage
+from load_metadata import current_data_version
+from pdf_stream import CompressingCanvas, LazyFlowables
+from report_filters import describe_filters, filter_key, filter_slug
+from report_store import register_report
+from report_styles import NODAL_OFFICER_TABLE_STYLE, get_styles, register_fonts
 from config_cloud import *
 
 # ======================================================
@@ -22,51 +27,128 @@ logging.basicConfig(
     format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
-def generate_pdf_from_sql():
+# ======================================================
+# Table rendering
+# ======================================================
+CELL_FONT = "Candara"
+CELL_FONT_SIZE = 10
+CELL_PADDING = 6  # matches LEFTPADDING/RIGHTPADDING of the table style
+# Body rows per Table flowable; keeps ReportLab from re-splitting one huge table
+ROWS_PER_TABLE = 60
+# No column may claim more than this share of the width before wrapping kicks in
+MAX_COL_SHARE = 0.35
+
+def measure_columns(df, font=CELL_FONT, size=CELL_FONT_SIZE):
+    """
+    Cell text per column (built from whole columns, not row by row) and the
+    rendered width of each distinct value, measured with the real font metrics.
+    """
+    texts, widths = {}, {}
+    for col in df.columns:
+        texts[col] = df[col].astype(str).tolist()
+        widths[col] = {v: pdfmetrics.stringWidth(v, font, size) for v in set(texts[col])}
+    return texts, widths
+
+
+def measure_col_widths(df, usable_width, measured=None):
+    """Column widths proportional to the widest rendered cell (or header) of each full column."""
+    _, widths = measured or measure_columns(df)
+    natural = []
+    for col in df.columns:
+        widest = max(widths[col].values(), default=0)
+        widest = max(widest, pdfmetrics.stringWidth(str(col), CELL_FONT, CELL_FONT_SIZE))
+        natural.append(min(widest + 2 * CELL_PADDING, usable_width * MAX_COL_SHARE))
+    total = sum(natural)
+    return [usable_width * (w / total) for w in natural]
+
+
+def build_table_data(df, col_widths, wrap_style, measured=None):
+    """Header + body rows: plain strings where the text fits, Paragraphs only where it must wrap."""
+    texts, widths = measured or measure_columns(df)
+    columns = []
+    for col, col_width in zip(df.columns, col_widths):
+        room = col_width - 2 * CELL_PADDING
+        too_wide = {v for v, w in widths[col].items() if w > room}
+        if too_wide:
+            columns.append([Paragraph(escape(v), wrap_style) if v in too_wide else v for v in texts[col]])
+        else:
+            columns.append(texts[col])
+
+    return [header_row(df, wrap_style)] + [list(row) for row in zip(*columns)]
+
+
+def header_row(df, wrap_style):
+    return [Paragraph(f"<b>{escape(str(col))}</b>", wrap_style) for col in df.columns]
+
+
+def build_tables(df, col_widths, wrap_style, measured=None, rows_per_table=ROWS_PER_TABLE):
+    """Split the result into page-sized Table flowables, each with its own header row."""
+    body = build_table_data(df, col_widths, wrap_style, measured)[1:]
+    tables = []
+    for i in range(0, max(len(body), 1), rows_per_table):
+        chunk = [header_row(df, wrap_style)] + body[i:i + rows_per_table]
+        table = Table(chunk, colWidths=col_widths, repeatRows=1, hAlign='CENTER')
+        table.setStyle(NODAL_OFFICER_TABLE_STYLE)
+        tables.append(table)
+    return tables
+
+
+def streamed_tables(chunks, col_widths, wrap_style, counter, progress=no_progress):
+    """Page-sized tables for each result chunk, built only when the document reaches them."""
+    for chunk in chunks:
+        counter["rows"] += len(chunk)
+        progress(None, f"Rendering PDF: {counter['rows']:,} rows streamed")
+        yield from build_tables(chunk, col_widths, wrap_style)
+    yield Spacer(1, 12)
+
+
+@instrumented("report_nodal_officer")
+def generate_pdf_from_sql(source="auto", stream=False, progress=no_progress, filters=None):
+    """
+    Build the Nodal Officer report; returns the PDF path (None if nothing was generated).
+    `source` is passed to analytics.fetch_report ("auto", "database" or "snapshot").
+    `filters` (district, department, date_from, date_to; see report_filters) limit
+    the grievances counted and are bound into the SQL.
+    With `stream=True` the result is read in chunks and turned into tables only
+    as the document lays them out, so memory stays flat however many rows come back.
+    """
     try:
         logging.info("===== PDF Report Generation Started =====")
-
-        # Step 1: Read SQL Query
-        logging.info(f"Reading SQL query from: {SQL_QUERY_PATH1}")
-        if not os.path.exists(SQL_QUERY_PATH1):
-            raise FileNotFoundError(f"SQL file not found at path: {SQL_QUERY_PATH1}")
-
-        with open(SQL_QUERY_PATH1, 'r') as file:
-            sql_query = file.read().strip()
-
-        if not sql_query:
-            raise ValueError("SQL file is empty. Please add a valid query.")
-
-        # Step 2: Execute Query
-        logging.info("Connecting to database and executing SQL query...")
-        with engine.connect() as connection:
-            df = pd.read_sql(text(sql_query), connection)
-
-        logging.info(f"SQL query executed successfully. Rows fetched: {len(df)}")
+        data_version = current_data_version()
+
+        # Step 1-2: Query the database (falls back to the in-process engine on the snapshot)
+        progress(0.05, "Running SQL query...")
+        with stage("sql_execution") as record:
+            if stream:
+                # only the first chunk is read here; the rest is fetched during the build
+                chunks = stream_report("nodal_officer", SQL_SUMMARY_PATH1, SQL_QUERY_PATH1, source=source,
+                                       filters=filters)
+                df = next(chunks, pd.DataFrame())
+            else:
+                df = fetch_report("nodal_officer", SQL_SUMMARY_PATH1, SQL_QUERY_PATH1, source=source, filters=filters)
+            record["rows"] = len(df)
+
+        logging.info(f"SQL query executed successfully. Rows fetched: {len(df)}{' (first chunk)' if stream else ''}")
 
         if df.empty:
             logging.warning("Query returned no data. PDF generation skipped.")
             print("⚠️ Query returned no data. Please check the SQL query or database.")
             return
 
-        # Step 3: Register Candara Font
-        candara_font_path = FONT_PATH
-        if not os.path.exists(candara_font_path):
-            raise FileNotFoundError(f"Candara font not found at: {candara_font_path}")
+        progress(0.3, f"Building tables for {len(df):,} rows...")
 
-        pdfmetrics.registerFont(TTFont("Candara", candara_font_path))
+        # Step 3: Register Candara Font (once per process)
+        register_fonts()
 
         # Step 4: Prepare PDF Output Path
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        pdf_filename = os.path.join(REPORT_PATH, f"Nodal_Officer_Report_{timestamp}.pdf")
+        # the suffix keeps reports generated within the same second apart
+        timestamp = f"{datetime.now():%Y%m%d_%H%M%S}_{uuid.uuid4().hex[:6]}"
+        slug = filter_slug(filters)
+        pdf_filename = os.path.join(REPORT_PATH, f"Nodal_Officer_Report_{slug + '_' if slug else ''}{timestamp}.pdf")
         logging.info(f"Generating PDF report at: {pdf_filename}")
 
         doc = SimpleDocTemplate(pdf_filename, pagesize=landscape(A3))
-        styles = getSampleStyleSheet()
-
-        # Override default styles with Candara
-        styles.add(ParagraphStyle(name='CandaraTitle', fontName='Candara', fontSize=18, leading=22, alignment=1))
-        styles.add(ParagraphStyle(name='CandaraNormal', fontName='Candara', fontSize=11, leading=14))
+        styles = get_styles()
 
         elements = []
 
@@ -74,78 +156,53 @@ def generate_pdf_from_sql():
         elements.append(Paragraph("Nodal Officer Grievance Summary Report", styles["CandaraTitle"]))
         elements.append(Spacer(1, 12))
         elements.append(Paragraph(f"Report Generated on: {datetime.now().strftime('%d-%m-%Y %H:%M:%S')}", styles["CandaraNormal"]))
+        if describe_filters(filters):
+            elements.append(Paragraph(escape(describe_filters(filters)), styles["CandaraNormal"]))
         elements.append(Spacer(1, 12))
 
-        # Step 6: Data Table (Auto column widths + Word wrapping + Centered)
-
-        # Define a wrapping style for cells
-        wrap_style = ParagraphStyle(
-            name='WrapStyle',
-            fontName='Candara',
-            fontSize=10,
-            alignment=TA_CENTER,
-            leading=12
-        )
-
-        # Convert DataFrame to table data with wrapped text
-        table_data = []
-        headers = [Paragraph(f"<b>{col}</b>", wrap_style) for col in df.columns]
-        table_data.append(headers)
+        # Step 6: Data Table (measured column widths, wrapping only where needed, page-sized chunks)
 
-        # Wrap each cell text
-        for _, row in df.iterrows():
-            wrapped_row = [Paragraph(str(cell), wrap_style) for cell in row]
-            table_data.append(wrapped_row)
+        # Wrapping style for cells that do not fit their column
+        wrap_style = styles["WrapStyle"]
 
-        # Calculate proportional column widths based on text length
         page_width, _ = landscape(A3)
         usable_width = page_width * 0.8
 
-        col_lengths = []
-        for col in df.columns:
-            sample_texts = df[col].astype(str).head(30)
-            avg_len = sample_texts.map(len).mean() + len(col)
-            col_lengths.append(avg_len)
-
-        total_len = sum(col_lengths)
-        col_widths = [(usable_width * (length / total_len)) for length in col_lengths]
-
-        # Create and style table
-        table = Table(table_data, colWidths=col_widths, repeatRows=1, hAlign='CENTER')
-
-        table.setStyle(TableStyle([
-            # Base font for all
-            ('FONTNAME', (0, 0), (-1, -1), 'Candara'),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTSIZE', (0, 0), (-1, -1), 11),
-
-            # Header row (apply color last to ensure it sticks)
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#FFE699")),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-
-            # Grid and alternating rows
-            ('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.whitesmoke, colors.lightgrey]),
-
-            # Spacing
-            ('LEFTPADDING', (0, 0), (-1, -1), 6),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 6),
-        ]))
-
-
-
+        if stream:
+            # Widths come from the first chunk; later values that do not fit wrap
+            col_widths = measure_col_widths(df, usable_width)
+            elements.append(Spacer(1, 12))
+            counter = {"rows": 0}
+            tables = streamed_tables(itertools.chain([df], chunks), col_widths, wrap_style, counter, progress)
+            del df
+
+            # Step 7: Build PDF
+            with stage("doc_build") as record:
+                doc.build(LazyFlowables(elements, tables), canvasmaker=CompressingCanvas)
+                record["rows"] = counter["rows"]
+            register_report(pdf_filename, "nodal_officer", data_version, filter_key(filters))
+            logging.info(f"✅ PDF generated successfully: {pdf_filename} ({counter['rows']} rows streamed)")
+            print(f"✅ PDF generated successfully: {pdf_filename}")
+            return pdf_filename
+
+        with stage("flowable_construction", rows=len(df)):
+            measured = measure_columns(df)
+            col_widths = measure_col_widths(df, usable_width, measured)
+            tables = build_tables(df, col_widths, wrap_style, measured)
 
         elements.append(Spacer(1, 12))
-        elements.append(table)
+        elements.extend(tables)
         elements.append(Spacer(1, 12))
 
 
         # Step 7: Build PDF
-        doc.build(elements)
+        doc.setProgressCallBack(render_progress(progress, 0.4, 1.0, len(df)))
+        with stage("doc_build", rows=len(df)):
+            doc.build(elements)
+        register_report(pdf_filename, "nodal_officer", data_version, filter_key(filters))
         logging.info(f"✅ PDF generated successfully: {pdf_filename}")
         print(f"✅ PDF generated successfully: {pdf_filename}")
+        return pdf_filename
 
     except Exception as e:
         logging.error(f"❌ Error during PDF generation: {str(e)}", exc_info=True)
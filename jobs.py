@@ -0,0 +1,117 @@
+import logging
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# ======================================================
+# Background jobs for normalization and report generation
+# ======================================================
+MAX_WORKERS = 4
+# Finished jobs kept for status lookups
+KEEP_FINISHED = 50
+
+
+class Job:
+    """Status record of one background run; updated by the worker thread."""
+
+    def __init__(self, kind, label=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.label = label or kind
+        self.status = "queued"
+        self.progress = 0.0
+        self.message = "Waiting for a free worker..."
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def done(self):
+        return self.status in ("succeeded", "failed")
+
+    @property
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def update(self, fraction=None, message=None):
+        """Progress callback handed to the pipelines: fraction in [0, 1] and a status line."""
+        if fraction is not None:
+            self.progress = min(max(float(fraction), 0.0), 1.0)
+        if message is not None:
+            self.message = message
+
+
+class JobRunner:
+    def __init__(self, max_workers=MAX_WORKERS):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="cmconnect-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind, fn, *args, label=None, **kwargs):
+        """Run fn(*args, progress=job.update, **kwargs) in the pool; returns the job id."""
+        job = Job(kind, label)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._pool.submit(self._run, job, fn, args, kwargs)
+        logging.info(f"Job {job.id} ({job.label}) queued")
+        return job.id
+
+    def _run(self, job, fn, args, kwargs):
+        job.status = "running"
+        job.started_at = time.time()
+        job.update(0.0, "Started")
+        try:
+            job.result = fn(*args, progress=job.update, **kwargs)
+            job.status = "succeeded"
+            job.update(1.0, "Completed")
+        except Exception as e:
+            job.error = f"{e}\n\n{traceback.format_exc()}"
+            job.status = "failed"
+            job.message = str(e)
+            logging.exception(f"Job {job.id} ({job.label}) failed")
+        finally:
+            job.finished_at = time.time()
+            logging.info(f"Job {job.id} ({job.label}) {job.status} in {job.elapsed:.2f} sec")
+
+    def _prune(self):
+        finished = sorted((j for j in self._jobs.values() if j.done), key=lambda j: j.finished_at)
+        for job in finished[:max(len(finished) - KEEP_FINISHED, 0)]:
+            del self._jobs[job.id]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self, kind=None):
+        with self._lock:
+            jobs = [j for j in self._jobs.values() if kind is None or j.kind == kind]
+        return sorted(jobs, key=lambda j: j.created_at, reverse=True)
+
+    def active(self, kind=None):
+        return [j for j in self.list(kind) if not j.done]
+
+
+def no_progress(fraction=None, message=None):
+    """Default progress callback for pipelines run outside a job."""
+    pass
+
+
+def render_progress(progress, start, end, rows):
+    """SimpleDocTemplate progress callback reporting doc.build within [start, end]."""
+    state = {"total": 1}
+
+    def callback(kind, value):
+        if kind == "SIZE_EST":
+            state["total"] = max(value, 1)
+        elif kind == "PROGRESS":
+            done = min(value / state["total"], 1.0)
+            progress(start + (end - start) * done, f"Rendering PDF: {int(rows * done):,} of {rows:,} rows")
+
+    return callback
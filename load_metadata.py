@@ -0,0 +1,37 @@
+import json
+import os
+from datetime import datetime
+from config_cloud import *
+
+# ======================================================
+# Metadata of the last successful load (data version etc.)
+# ======================================================
+METADATA_PATH = os.path.join(PROCESSED_PATH, "load_metadata.json")
+
+
+def read_metadata():
+    try:
+        with open(METADATA_PATH, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def current_data_version():
+    """Version stamp of the data currently loaded, or None if no load has been recorded."""
+    return read_metadata().get("data_version")
+
+
+def record_load(**fields):
+    """Bump the data version after a successful load; returns the new version."""
+    version = datetime.now().strftime("%Y%m%d%H%M%S%f")
+    metadata = {
+        "data_version": version,
+        "loaded_at": datetime.now().isoformat(timespec="seconds"),
+        **fields,
+    }
+    tmp_path = METADATA_PATH + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(metadata, f, indent=2, default=str)
+    os.replace(tmp_path, METADATA_PATH)
+    return version
@@ -0,0 +1,193 @@
+import cProfile
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from config_cloud import *
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# ======================================================
+# Per-stage timing for the ingest and report pipelines (JSON lines)
+# ======================================================
+METRICS_PATH = os.path.join(LOG_DIR, "metrics.jsonl")
+PROFILE_DIR = os.path.join(LOG_DIR, "profiles")
+# CMCONNECT_PROFILE=1 captures a cProfile dump for every pipeline run
+PROFILE = os.environ.get("CMCONNECT_PROFILE") == "1"
+
+_write_lock = threading.Lock()
+_local = threading.local()
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far (None where unavailable)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def rss_mb():
+    """Current resident set size of this process (None where unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024), 1)
+    except (OSError, ValueError, IndexError):
+        pass
+    if psutil is not None:  # macOS, Windows
+        return round(psutil.Process().memory_info().rss / (1024 * 1024), 1)
+    return None
+
+
+class RunMetrics:
+    """
+    Stage totals of one pipeline run; stages entered repeatedly (per chunk) accumulate.
+    Memory is the current RSS around each stage: "rss_mb" is the highest RSS a
+    stage ended with, "rss_growth_mb" the most RSS one call of it added.
+    """
+
+    def __init__(self, pipeline, **fields):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.pipeline = pipeline
+        self.fields = fields
+        self.started = time.perf_counter()
+        self.rss_start = rss_mb()
+        self.stages = OrderedDict()
+        # set by pipelines that report failure through a return value
+        self.status = None
+
+    def _stage(self, name):
+        return self.stages.setdefault(
+            name, {"wall_s": 0.0, "rows": 0, "calls": 0, "rss_mb": None, "rss_growth_mb": None}
+        )
+
+    @contextmanager
+    def stage(self, name, rows=0):
+        record = self._stage(name)
+        rss_before = rss_mb()
+        t0 = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["wall_s"] += time.perf_counter() - t0
+            record["rows"] += rows
+            record["calls"] += 1
+            rss_after = rss_mb()
+            if rss_after is not None:
+                growth = round(rss_after - rss_before, 1)
+                record["rss_mb"] = max(record["rss_mb"] or 0.0, rss_after)
+                if record["rss_growth_mb"] is None or growth > record["rss_growth_mb"]:
+                    record["rss_growth_mb"] = growth
+
+    def write(self, status):
+        ts = datetime.now().isoformat(timespec="seconds")
+        rss_end = rss_mb()
+        lines = []
+        for name, record in self.stages.items():
+            lines.append({
+                "ts": ts, "run_id": self.run_id, "pipeline": self.pipeline, "stage": name,
+                **record, "wall_s": round(record["wall_s"], 4), **self.fields,
+            })
+        lines.append({
+            "ts": ts, "run_id": self.run_id, "pipeline": self.pipeline, "stage": "total",
+            "wall_s": round(time.perf_counter() - self.started, 4), "rows": None, "calls": 1,
+            "rss_mb": rss_end, "rss_growth_mb": None if rss_end is None else round(rss_end - self.rss_start, 1),
+            "status": status, **self.fields,
+        })
+        with _write_lock, open(METRICS_PATH, "a") as f:
+            for line in lines:
+                f.write(json.dumps(line, default=str) + "\n")
+
+
+@contextmanager
+def pipeline_run(pipeline, profile=None, **fields):
+    """Collect stage metrics for everything this thread runs inside the block."""
+    run = RunMetrics(pipeline, **fields)
+    previous = getattr(_local, "run", None)
+    _local.run = run
+    profiler = cProfile.Profile() if (PROFILE if profile is None else profile) else None
+    if profiler:
+        profiler.enable()
+    status = "failed"
+    try:
+        yield run
+        status = run.status or "ok"
+    finally:
+        if profiler:
+            profiler.disable()
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            profile_path = os.path.join(PROFILE_DIR, f"{pipeline}_{run.run_id}.prof")
+            profiler.dump_stats(profile_path)
+            logging.info(f"cProfile written to {profile_path}")
+        _local.run = previous
+        try:
+            run.write(status)
+        except OSError:
+            logging.exception("Could not write pipeline metrics")
+
+
+def instrumented(pipeline):
+    """Run the decorated pipeline inside pipeline_run; a falsy return value counts as failed."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with pipeline_run(pipeline) as run:
+                result = fn(*args, **kwargs)
+                if not result:
+                    run.status = "failed"
+                return result
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def stage(name, rows=0):
+    """Time a stage of the current pipeline run (a no-op outside pipeline_run)."""
+    run = getattr(_local, "run", None)
+    if run is None:
+        yield {}
+        return
+    with run.stage(name, rows) as record:
+        yield record
+
+
+def timed_iter(iterable, name):
+    """Yield from `iterable`, booking the time spent producing items (and their rows) to `name`."""
+    iterator = iter(iterable)
+    while True:
+        with stage(name) as record:
+            item = next(iterator, None)
+            if item is not None and record:
+                record["rows"] += len(item)
+        if item is None:
+            return
+        yield item
+
+
+def read_metrics(limit_runs=30):
+    """Stage records of the most recent runs, oldest first."""
+    try:
+        with open(METRICS_PATH, "r") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+    run_ids = list(OrderedDict.fromkeys(r["run_id"] for r in records))[-limit_runs:]
+    keep = set(run_ids)
+    return [r for r in records if r["run_id"] in keep]
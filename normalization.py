@@ -1,8 +1,24 @@
 import pandas as pd
+import numpy as np
 import logging
 import os
 import time
 import re
+from openpyxl import load_workbook
+from sqlalchemy import BigInteger, DateTime, Integer, Text, inspect
+from bulk_loader import (
+    HASH_COLUMN, REPORT_INDEXES, build_indexes, bulk_load, log_throughput, merge_delta, row_hashes, swap_in,
+    widen_to_text,
+)
+from aggregates import build_aggregates
+from coordination import ingest_lock, latest_workbook, prune_uploads
+from dimension_tables import DIMENSION_TABLES
+from dimensions import Dimensions
+from fingerprint import SHEET_PRECHECK, file_sha256, sheet_digests
+from jobs import no_progress
+from load_metadata import read_metadata, record_load
+from metrics import instrumented, stage, timed_iter
+from snapshots import Snapshot
 from config_cloud import *
 
 os.makedirs(LOG_DIR, exist_ok=True)
@@ -15,81 +31,389 @@ logging.basicConfig(
     filemode="a"
 )
 
-def run_normalization():
+# Rows held in memory at once while streaming a sheet into the database
+CHUNK_SIZE = 20000
+
+# ======================================================
+# Dtype plan for the EPS sheet (normalized column names)
+# ======================================================
+# Low-cardinality text is categorical, so cleanup runs once per distinct value
+# and a chunk holds each string once. Explicit SQL types keep every chunk's
+# upload identical whatever the chunk happened to contain. The columns listed
+# in dimension_tables.DIMENSIONS reach the database as their integer "key" columns.
+EPS_SCHEMA = {
+    "district": "category",
+    "block": "category",
+    "status": "category",
+    "new_department": "category",
+    "new_category": "category",
+    "ticket_currently_pending_with": "category",
+    "officer_name": "category",
+    "source_primary": "category",
+    "source_secondary": "category",
+    "date_of_complaint": "datetime",
+    "officer_id": "key",
+    "department_id": "key",
+    "category_id": "key",
+    "district_id": "key",
+    "block_id": "key",
+}
+SQL_TYPES = {"category": Text(), "datetime": DateTime(), "integer": BigInteger(), "key": Integer()}
+
+
+# Column normalization
+def normalize_cols(cols):
+    cols = cols.str.strip()
+    cols = cols.str.replace(r"[^\w]+", "_", regex=True)
+    return cols.str.lower()
+
+
+def sheet_columns(header):
+    """Header row -> column names, labelled and de-duplicated the way pd.read_excel does."""
+    columns, seen = [], {}
+    for i, name in enumerate(header):
+        name = f"Unnamed: {i}" if name is None else str(name)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        columns.append(name)
+    return columns
+
+
+def iter_sheet_chunks(workbook, sheet_name, chunksize=CHUNK_SIZE):
+    """Yield DataFrames of at most `chunksize` rows from a read-only worksheet."""
+    rows = workbook[sheet_name].iter_rows(values_only=True)
+    header = next(rows, None)
+    if header is None:
+        return
+
+    columns = sheet_columns(header)
+    width = len(columns)
+
+    def to_frame(records):
+        # empty cells become NaN, as they do with pd.read_excel
+        return pd.DataFrame.from_records(records, columns=columns).fillna(np.nan)
+
+    buffer = []
+    for row in rows:
+        # read-only sheets report ragged rows and trailing blank lines
+        if not any(v is not None for v in row):
+            continue
+        row = tuple(row[:width]) + (None,) * (width - len(row))
+        buffer.append(row)
+        if len(buffer) >= chunksize:
+            yield to_frame(buffer)
+            buffer = []
+    if buffer:
+        yield to_frame(buffer)
+
+
+def apply_schema(df, schema):
+    """Cast the columns declared in `schema`; other integer columns are downcast."""
+    for col in df.columns:
+        kind = schema.get(col)
+        if kind == "category":
+            df[col] = df[col].astype("category")
+        elif kind == "datetime":
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+        elif pd.api.types.is_integer_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col], downcast="integer")
+    return df
+
+
+def sql_dtypes(df, schema):
+    """SQL types for uploading `df`: the declared kinds, downcast integers stay BIGINT."""
+    dtype = {col: SQL_TYPES[kind] for col, kind in schema.items() if col in df.columns}
+    for col in df.columns:
+        if col not in dtype and pd.api.types.is_integer_dtype(df[col]):
+            dtype[col] = SQL_TYPES["integer"]
+    return dtype
+
+
+def map_categories(series, clean):
+    """Run a vectorised string cleanup over the distinct values of a categorical, not every row."""
+    categories = series.cat.categories
+    if len(categories) == 0:
+        return series
+    # cleaned values may collide ("Mylliem C & RD Block" and "Mylliem "), so re-factorize
+    new_codes, cleaned = pd.factorize(clean(pd.Series(categories.astype(str))).to_numpy())
+    codes = series.cat.codes.to_numpy()
+    codes = np.where(codes >= 0, new_codes[codes], -1)
+    return pd.Series(pd.Categorical.from_codes(codes, categories=cleaned), index=series.index, name=series.name)
+
+
+def clean_eps_chunk(df_eps):
+    # Value cleanup
+    rename_map = {
+        'source': 'source_primary',
+        'source1': 'source_secondary'
+    }
+    df_eps.rename(columns=rename_map, inplace=True)
+
+    if '' in df_eps.columns:
+        df_eps.rename(columns={'': 'officer_name'}, inplace=True)
+
+    # categoricals and parsed dates; blanks stay NULL instead of becoming "nan"
+    df_eps = apply_schema(df_eps, EPS_SCHEMA)
+
+    # dimension values are trimmed here, once, instead of TRIM() in every report query
+    for col in ('ticket_currently_pending_with', 'new_department', 'new_category'):
+        if col in df_eps.columns:
+            df_eps[col] = map_categories(df_eps[col], lambda v: v.str.strip(" "))
+
+    if 'district' in df_eps.columns:
+        df_eps['district'] = map_categories(df_eps['district'], lambda v: v.str.strip(" ").replace({'Ri-Bhoi': 'Ri Bhoi'}))
+
+    if 'block' in df_eps.columns:
+        df_eps['block'] = map_categories(
+            df_eps['block'],
+            lambda v: v.str.replace(r"c\s*&\s*rd\s*block", "", regex=True, flags=re.I)
+                       .str.replace(r"\s+", " ", regex=True)
+                       .str.strip(" ")
+                       .str.title()
+        )
+
+    return df_eps
+
+
+def column_kinds(df):
+    """Remember which columns the first chunk created as numeric or datetime."""
+    kinds = {}
+    for col in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[col]):
+            kinds[col] = "datetime"
+        elif pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col]):
+            kinds[col] = "numeric"
+    return kinds
+
+
+def as_text(series):
+    """Values as strings, NULLs kept; whole numbers read as floats print without ".0", as read_excel kept them."""
+    def text_value(value):
+        if isinstance(value, float) and value.is_integer():
+            return str(int(value))
+        return str(value)
+    return series.astype(object).map(text_value, na_action="ignore")
+
+
+def conform_chunk(df, kinds, table):
+    """
+    Coerce a later chunk to the column types the first chunk created in the table.
+    A column with values that do not fit (e.g. "AB12" in a numeric column) becomes
+    text instead of losing them; returns the chunk and the columns that did.
+    """
+    widened = []
+    for col, kind in kinds.items():
+        if col not in df.columns:
+            continue
+        if kind == "text":
+            df[col] = as_text(df[col])
+            continue
+        if kind == "numeric" and not pd.api.types.is_numeric_dtype(df[col]):
+            coerced = pd.to_numeric(df[col], errors='coerce')
+        elif kind == "datetime" and not pd.api.types.is_datetime64_any_dtype(df[col]):
+            coerced = pd.to_datetime(df[col], errors='coerce')
+        else:
+            continue
+        if coerced.notna().sum() < df[col].notna().sum():
+            df[col] = as_text(df[col])
+            widened.append(col)
+        else:
+            df[col] = coerced
+    for col in widened:
+        kinds[col] = "text"
+    return df, widened
+
+
+def load_sheet(workbook, sheet_name, table, clean=None, schema=None, chunksize=CHUNK_SIZE, incremental=False,
+               snapshot=None, dimensions=None, progress=no_progress, span=(0.0, 1.0), widened=None):
+    """
+    Stream one sheet into a shadow copy of `table` chunk by chunk; returns the
+    number of rows written.
+
+    A full load indexes `<table>_shadow` and swaps it in atomically. With
+    `incremental=True` the sheet is streamed into `<table>_incoming` and only the
+    grievances whose rows changed are applied to `table`.
+    `schema` is the sheet's dtype plan; it fixes the SQL column types.
+    Cleaned chunks are also appended to `snapshot` (a snapshots.Snapshot) if given.
+    With `dimensions` (a dimensions.Dimensions) the dimension columns are stored
+    as integer keys and the dimension tables are published before the table.
+    `progress(fraction, message)` is reported within `span` of the whole run.
+    Columns turned to text part way through (see conform_chunk) are appended
+    to `widened` as "table.column".
+    """
+    target = f"{table}_incoming" if incremental else f"{table}_shadow"
+    start, end = span
+    # the sheet's dimension tag is an estimate; read-only mode may not know it
+    expected_rows = max((workbook[sheet_name].max_row or 0) - 1, 0)
+    progress(start, f"Reading sheet '{sheet_name}'...")
+    rows_written = 0
+    upload_seconds = 0.0
+    kinds = None
+    for chunk in timed_iter(iter_sheet_chunks(workbook, sheet_name, chunksize), f"excel_read:{sheet_name}"):
+        with stage(f"column_normalization:{table}", rows=len(chunk)):
+            chunk.columns = normalize_cols(chunk.columns.astype(str))
+        if clean is not None:
+            with stage(f"value_cleanup:{table}", rows=len(chunk)):
+                chunk = clean(chunk)
+
+        if kinds is None:
+            kinds = column_kinds(chunk)
+            if_exists = 'replace'
+        else:
+            chunk, retyped = conform_chunk(chunk, kinds, table)
+            for col in retyped:
+                # the rows already loaded keep their values, as text
+                widen_to_text(ingest_engine, target, col)
+                if snapshot is not None:
+                    snapshot.widen(table, col)
+                logging.warning(f"⚠️ {table}.{col}: values after row {rows_written:,} do not fit the column type "
+                                f"of the first chunk; the column is loaded as text")
+                if widened is not None:
+                    widened.append(f"{table}.{col}")
+            if_exists = 'append'
+
+        if snapshot is not None:
+            with stage(f"snapshot:{table}", rows=len(chunk)):
+                snapshot.write(table, chunk)
+        if dimensions is not None:
+            with stage(f"dimension_keys:{table}", rows=len(chunk)):
+                chunk = dimensions.encode(chunk)
+        with stage(f"row_hash:{table}", rows=len(chunk)):
+            chunk[HASH_COLUMN] = row_hashes(chunk)
+        with stage(f"upload:{table}", rows=len(chunk)):
+            dtype = sql_dtypes(chunk, schema) if schema else None
+            upload_seconds += bulk_load(chunk, target, ingest_engine, if_exists=if_exists, dtype=dtype)
+        rows_written += len(chunk)
+        logging.info(f"{table}: {rows_written} rows written")
+
+        done = min(rows_written / expected_rows, 1.0) if expected_rows else 0.5
+        progress(start + (end - start) * 0.9 * done, f"{sheet_name}: {rows_written:,} rows cleaned and uploaded")
+
+    if kinds is None:
+        raise ValueError(f"Sheet '{sheet_name}' has no header row.")
+    log_throughput(target, rows_written, upload_seconds)
+
+    progress(start + (end - start) * 0.9, f"{table}: indexing and publishing {rows_written:,} rows...")
+    index_columns = [c for c in REPORT_INDEXES.get(table, []) if c in chunk.columns]
+    with stage(f"publish:{table}", rows=rows_written):
+        # dimension tables only grow, so the table in place keeps resolving while they are swapped
+        if dimensions is not None:
+            dimensions.publish(ingest_engine)
+        if incremental and 'grievance_id' in chunk.columns and merge_delta(ingest_engine, target, table) is not None:
+            build_indexes(ingest_engine, table, index_columns, if_not_exists=True)
+        else:
+            build_indexes(ingest_engine, target, index_columns)
+            swap_in(ingest_engine, target, table, index_columns)
+    return rows_written
+
+
+def tables_exist(*tables):
+    inspector = inspect(ingest_engine)
+    return all(inspector.has_table(table) for table in tables)
+
+
+def run_normalization(incremental=False, force=False, progress=no_progress, excel_path=None):
+    """
+    Load `excel_path` (default: the latest workbook in RAW_DATA_PATH or its upload
+    directories); returns a summary dict, or False on failure.
+
+    Loads run one at a time across threads and processes (coordination.ingest_lock);
+    a second one waits for the first to finish.
+
+    A workbook byte-identical to the last one loaded is skipped entirely
+    (summary["unchanged"] is True) and the sheets in SHEET_PRECHECK are only
+    reloaded when their contents changed. `force=True` reloads everything.
+    """
+    waiting = lambda: progress(None, "Waiting for another normalization to finish...")
+    with ingest_lock(on_wait=waiting):
+        summary = normalize_workbook(excel_path, incremental, force, progress)
+        if summary:
+            prune_uploads(keep_path=summary["source"])
+        return summary
+
+
+@instrumented("normalization")
+def normalize_workbook(excel_path=None, incremental=False, force=False, progress=no_progress):
+    """run_normalization() without the ingest lock; the caller must hold it."""
     t0 = time.time()
-    logging.info("🚀 Normalization started (optimized mode)")
+    mode = "incremental" if incremental else "full"
+    logging.info(f"🚀 Normalization started (streaming, {mode} load)")
 
+    snapshot = None
     try:
-        raw_files = [f for f in os.listdir(RAW_DATA_PATH) if f.endswith(".xlsx")]
-        if not raw_files:
-            raise FileNotFoundError("No Excel files found.")
-
-        latest_file = max(raw_files, key=lambda f: os.path.getmtime(os.path.join(RAW_DATA_PATH, f)))
-        excel_path = os.path.join(RAW_DATA_PATH, latest_file)
+        excel_path = excel_path or latest_workbook()
+        latest_file = os.path.basename(excel_path)
         logging.info(f"Using file: {excel_path}")
 
-        df_eps = pd.read_excel(excel_path, sheet_name='EPS RAW', engine="openpyxl")
-        df_crm = pd.read_excel(excel_path, sheet_name='CRM RAW', engine="openpyxl")
+        # Fingerprint the upload against the last successful load
+        previous = read_metadata()
+        seen = previous.get("fingerprint", {}) if not force else {}
+        with stage("fingerprint"):
+            fingerprint = {"sha256": file_sha256(excel_path)}
+        if seen.get("sha256") == fingerprint["sha256"] and tables_exist("staging_grievance", "crm_raw", *DIMENSION_TABLES):
+            logging.info(f"⏭️ {latest_file} is identical to the workbook loaded at {previous.get('loaded_at')}; nothing to do")
+            progress(1.0, f"No changes: this workbook was already loaded on {previous.get('loaded_at')}")
+            return {"unchanged": True, "skipped": ["staging_grievance", "crm_raw"], "rows": previous.get("rows", {}),
+                    "source": excel_path}
 
-        df_eps.columns = df_eps.columns.astype(str)
-        df_crm.columns = df_crm.columns.astype(str)
+        with stage("fingerprint"):
+            fingerprint["sheets"] = sheet_digests(excel_path, SHEET_PRECHECK)
+        unchanged_sheets = {
+            sheet for sheet, digest in fingerprint["sheets"].items()
+            if seen.get("sheets", {}).get(sheet) == digest
+        }
 
-        # Column normalization
-        def normalize_cols(cols):
-            cols = cols.str.strip()
-            cols = cols.str.replace(r"[^\w]+", "_", regex=True)
-            return cols.str.lower()
+        # Open the workbook once; read-only mode parses rows lazily
+        workbook = load_workbook(excel_path, read_only=True, data_only=True)
+        snapshot = Snapshot()
+        widened = []
+        try:
+            eps_rows = load_sheet(workbook, 'EPS RAW', 'staging_grievance', clean=clean_eps_chunk, schema=EPS_SCHEMA,
+                                  incremental=incremental, snapshot=snapshot, dimensions=Dimensions(ingest_engine),
+                                  progress=progress, span=(0.0, 0.7), widened=widened)
+            if 'CRM RAW' in unchanged_sheets and tables_exist("crm_raw"):
+                crm_rows = previous.get("rows", {}).get("crm_raw")
+                skipped = ["crm_raw"]
+                snapshot.carry_over("crm_raw")
+                logging.info("⏭️ CRM RAW is unchanged since the last load; crm_raw kept as is")
+            else:
+                crm_rows = load_sheet(workbook, 'CRM RAW', 'crm_raw', incremental=incremental,
+                                      snapshot=snapshot, progress=progress, span=(0.7, 0.9), widened=widened)
+                skipped = []
+        finally:
+            workbook.close()
 
-        df_eps.columns = normalize_cols(df_eps.columns)
-        df_crm.columns = normalize_cols(df_crm.columns)
+        logging.info(f"Rows loaded: staging_grievance={eps_rows}, crm_raw={crm_rows}")
 
-        # Value cleanup
-        rename_map = {
-            'source': 'source_primary',
-            'source1': 'source_secondary'
-        }
-        df_eps.rename(columns=rename_map, inplace=True)
-
-        if '' in df_eps.columns:
-            df_eps.rename(columns={'': 'officer_name'}, inplace=True)
-
-        if 'district' in df_eps.columns:
-            df_eps['district'] = df_eps['district'].replace({'Ri-Bhoi': 'Ri Bhoi'})
-
-        if 'block' in df_eps.columns:
-            df_eps['block'] = (
-                df_eps['block']
-                .astype(str)
-                .str.replace(r"c\s*&\s*rd\s*block", "", regex=True, flags=re.I)
-                .str.replace(r"\s+", " ", regex=True)
-                .str.title()
-            )
-
-        if 'date_of_complaint' in df_eps.columns:
-            df_eps['date_of_complaint'] = pd.to_datetime(df_eps['date_of_complaint'], errors='coerce')
-
-        # Upload to DB
-        df_eps.to_sql(
-            'staging_grievance',
-            con=engine,
-            if_exists='replace',
-            index=False,
-            chunksize=5000,
-            method="multi"
-        )
+        # Final stage: summary tables the report generators read from
+        progress(0.9, "Building report summary tables...")
+        with stage("aggregates"):
+            build_aggregates(ingest_engine)
 
-        df_crm.to_sql(
-            'crm_raw',
-            con=engine,
-            if_exists='replace',
-            index=False,
-            chunksize=5000,
-            method="multi"
+        rows = {"staging_grievance": eps_rows, "crm_raw": crm_rows}
+        data_version = record_load(
+            mode=mode,
+            source_file=latest_file,
+            rows=rows,
+            aggregates=True,
+            fingerprint=fingerprint,
         )
-
+        logging.info(f"Data version bumped to {data_version}")
+        with stage("snapshot_publish"):
+            snapshot.publish(data_version)
         logging.info(f"🏁 Normalization finished in {round(time.time() - t0, 2)} sec")
-        return True
+        message = f"Loaded {eps_rows:,} EPS rows"
+        message += "; CRM sheet unchanged, kept the loaded copy" if skipped else f" and {crm_rows:,} CRM rows"
+        if widened:
+            message += f"; loaded as text: {', '.join(widened)}"
+        progress(1.0, message)
+        return {"unchanged": False, "skipped": skipped, "rows": rows, "widened": widened, "source": excel_path}
 
     except Exception as e:
         logging.exception(f"❌ Error: {str(e)}")
+        if snapshot is not None:
+            snapshot.discard()
         return False
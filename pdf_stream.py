@@ -0,0 +1,74 @@
+import pandas as pd
+from reportlab import rl_config
+from reportlab.pdfbase.pdfdoc import PDFArray, PDFBase85Encode, PDFName, PDFStream, PDFZCompress
+from reportlab.pdfgen.canvas import Canvas
+from sqlalchemy import text
+
+# ======================================================
+# Streaming query-to-PDF building blocks shared by the report generators
+# ======================================================
+# Rows fetched per round trip from the server-side cursor
+STREAM_CHUNK_ROWS = 5000
+# Flowables materialized ahead of the one being laid out
+LOOKAHEAD = 8
+
+
+def read_sql_chunks(sql_query, con, chunksize=STREAM_CHUNK_ROWS, params=None):
+    """
+    Yield the result of `sql_query` (with bound `params`) as DataFrames of at most
+    `chunksize` rows, read through a server-side cursor (stream_results) where the
+    driver has one.
+    """
+    with con.connect().execution_options(stream_results=True, max_row_buffer=chunksize) as connection:
+        for chunk in pd.read_sql(text(sql_query), connection, params=params, chunksize=chunksize):
+            yield chunk
+
+
+class LazyFlowables(list):
+    """
+    Flowable list for doc.build() that pulls from a generator as the document
+    consumes it, so only a few flowables exist at a time.
+
+    BaseDocTemplate.build() loops on len(), reads and deletes from the front and
+    pushes split remainders back with slice assignment and insert(0, ...), all of
+    which act on the materialized part; len() tops it up first.
+    """
+
+    def __init__(self, head, source, lookahead=LOOKAHEAD):
+        super().__init__(head)
+        self._source = iter(source)
+        self._lookahead = lookahead
+
+    def _refill(self):
+        while self._source is not None and super().__len__() < self._lookahead:
+            try:
+                self.append(next(self._source))
+            except StopIteration:
+                self._source = None
+
+    def __len__(self):
+        self._refill()
+        return super().__len__()
+
+
+class CompressingCanvas(Canvas):
+    """
+    Canvas that encodes each page's content stream as soon as the page is
+    finished. A plain Canvas keeps every page's drawing operators as text until
+    save(), which is what still grows with the row count once rows are streamed.
+    The saved file is byte-for-byte the same.
+    """
+
+    def showPage(self):
+        super().showPage()
+        page = self._doc.Pages.pages[-1]
+        if page.compression and page.stream and not page.Contents:
+            filters = [PDFBase85Encode, PDFZCompress] if rl_config.useA85 else [PDFZCompress]
+            content = page.stream
+            for f in reversed(filters):
+                content = f.encode(content)
+            contents = PDFStream(content=content)
+            contents.dictionary["Filter"] = PDFArray([PDFName(f.pdfname) for f in filters])
+            contents.__Comment__ = "page stream"
+            page.Contents = contents
+            page.stream = None
@@ -0,0 +1,121 @@
+"""
+Reports rendered ahead of time for the data currently loaded.
+
+The app starts a warm-up after every successful normalization, and optionally
+every PREBUILD_EVERY_MINUTES (CMCONNECT_PREBUILD_EVERY_MINUTES, 0 = off) as a
+safety net for loads made outside the app. A warm-up only renders the reports
+that have no PDF for the current data version yet.
+
+    python prebuild.py              # warm up once
+    python prebuild.py --every 30   # keep warming up every 30 minutes
+"""
+import os
+import sys
+import time
+import logging
+import threading
+import schedule
+from coordination import run_report
+from jobs import no_progress
+from load_metadata import current_data_version
+from report_filters import filter_key
+from report_store import find_report, report_path
+
+PREBUILD_EVERY_MINUTES = int(os.environ.get("CMCONNECT_PREBUILD_EVERY_MINUTES", 0))
+
+# One warm-up at a time per process (post-load and scheduled runs can meet);
+# a request arriving meanwhile makes the running warm-up go again when it is done
+_running = threading.Lock()
+_requested = threading.Event()
+
+
+def prebuilt_report(report, filters=None):
+    """Index entry of `report` already rendered from the current data with `filters`, or None."""
+    data_version = current_data_version()
+    if not data_version:
+        return None
+    return find_report(report, data_version, filter_key(filters))
+
+
+def render(report):
+    # imported here: the app should not pay for ReportLab until a report is rendered;
+    # run_report shares the run with an identical request from a user
+    if report == "nodal_officer":
+        from generate_pdf import generate_pdf_from_sql
+        return run_report(generate_pdf_from_sql)
+    from report_pdf import generate_pdf2_from_sql
+    outputs = run_report(generate_pdf2_from_sql)
+    return outputs and outputs["combined"]
+
+
+def prebuild_reports(progress=no_progress):
+    """
+    Render every report missing for the current data version; returns {report: path}.
+    While another warm-up runs, this one is handed to it: that warm-up runs again
+    for the data version current when it finishes (a load may have landed meanwhile).
+    """
+    if not current_data_version():
+        logging.info("Report warm-up skipped: no data loaded yet")
+        return {}
+    _requested.set()
+    built = {}
+    while _requested.is_set():
+        if not _running.acquire(blocking=False):
+            logging.info("Report warm-up already running; it will run again for the latest data when done")
+            return built
+        try:
+            _requested.clear()
+            built = _prebuild_current(progress)
+        finally:
+            _running.release()
+    return built
+
+
+def _prebuild_current(progress):
+    built = {}
+    reports = ("nodal_officer", "pending_summary")
+    for n, report in enumerate(reports):
+        entry = prebuilt_report(report)
+        if entry:
+            built[report] = report_path(entry)
+            continue
+        progress(n / len(reports), f"Pre-building the {report.replace('_', ' ')} report...")
+        path = render(report)
+        if not path:
+            raise RuntimeError(f"Pre-building {report} failed. Check logs.")
+        built[report] = path
+        logging.info(f"🔥 {report} pre-built for data version {current_data_version()}: {path}")
+    return built
+
+
+def _safe_prebuild():
+    # schedule drops a job that raises, taking the whole recurring warm-up with it;
+    # log the failure and let the next tick try again
+    try:
+        prebuild_reports()
+    except Exception:
+        logging.exception("❌ Scheduled report warm-up failed; retrying at the next tick")
+
+
+def run_schedule(every_minutes):
+    schedule.every(every_minutes).minutes.do(_safe_prebuild)
+    while True:
+        schedule.run_pending()
+        time.sleep(30)
+
+
+def start_schedule(every_minutes=PREBUILD_EVERY_MINUTES):
+    """Warm up every `every_minutes` in a daemon thread; returns the thread, or None when disabled."""
+    if not every_minutes:
+        return None
+    thread = threading.Thread(target=run_schedule, args=(every_minutes,), name="cmconnect-prebuild", daemon=True)
+    thread.start()
+    logging.info(f"Report warm-up scheduled every {every_minutes} min")
+    return thread
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    prebuild_reports()
+    if "--every" in sys.argv:
+        run_schedule(int(sys.argv[sys.argv.index("--every") + 1]))
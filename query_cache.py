@@ -0,0 +1,124 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+from sqlalchemy import text
+
+from load_metadata import current_data_version
+from config_cloud import *
+
+# ======================================================
+# Report query results, cached per SQL text and data version
+# ======================================================
+CACHE_DIR = os.path.join(PROCESSED_PATH, "query_cache")
+MEMORY_ENTRIES = 16
+
+
+class QueryCache:
+    """Two-tier (in-memory LRU + pickles on disk) cache of query result DataFrames."""
+
+    def __init__(self, directory=CACHE_DIR, max_entries=MEMORY_ENTRIES):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(sql, data_version):
+        digest = hashlib.sha256(sql.encode("utf-8")).hexdigest()[:32]
+        return f"{data_version}_{digest}"
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return self._memory[key]
+
+        try:
+            with open(self._path(key), "rb") as f:
+                df = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            with self._lock:
+                self.counters["misses"] += 1
+            return None
+
+        with self._lock:
+            self.counters["disk_hits"] += 1
+        self._remember(key, df)
+        return df
+
+    def put(self, key, df):
+        self._remember(key, df)
+        tmp_path = self._path(key) + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self._path(key))
+        self._drop_other_versions(key.split("_", 1)[0])
+
+    def _remember(self, key, df):
+        with self._lock:
+            self._memory[key] = df
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _drop_other_versions(self, data_version):
+        # results of earlier loads can never be hit again
+        for name in os.listdir(self.directory):
+            if name.endswith(".pkl") and not name.startswith(f"{data_version}_"):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+    def stats(self):
+        with self._lock:
+            lookups = sum(self.counters.values())
+            hits = self.counters["memory_hits"] + self.counters["disk_hits"]
+            return {
+                **self.counters,
+                "memory_entries": len(self._memory),
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+query_cache = QueryCache()
+
+
+def read_sql_cached(sql_query, con, params=None, on_miss=None):
+    """
+    pd.read_sql that answers repeat queries (same SQL and bound `params`) from the cache until the next load.
+    `on_miss()` is called just before the query actually runs.
+    """
+    data_version = current_data_version()
+    if data_version is None:
+        # no recorded load: the table may have changed behind our back
+        if on_miss:
+            on_miss()
+        with con.connect() as connection:
+            return pd.read_sql(text(sql_query), connection, params=params)
+
+    key = QueryCache.make_key(sql_query + json.dumps(params, sort_keys=True, default=str), data_version)
+    df = query_cache.get(key)
+    if df is not None:
+        logging.info(f"Query result served from cache (data version {data_version}): {query_cache.stats()}")
+        return df
+
+    if on_miss:
+        on_miss()
+    with con.connect() as connection:
+        df = pd.read_sql(text(sql_query), connection, params=params)
+    query_cache.put(key, df)
+    logging.info(f"Query result cached (data version {data_version}): {query_cache.stats()}")
+    return df
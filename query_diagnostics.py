@@ -0,0 +1,291 @@
+"""
+Query plans and timings of the bundled report SQL (Sqlqueries/*.sql).
+
+capture_plans() explains and times every SQL file against the loaded data and
+stores the result under the current data version; the app's Pipeline Metrics
+page shows the stored plans. With CMCONNECT_QUERY_DIAGNOSTICS=1 every report
+query the PDF generators and exports run against the database is explained
+and stored as well: timed (so run twice) when its result is read whole and not
+served from the query cache, plan only when it is streamed.
+
+    python query_diagnostics.py           # capture plans for the current data version
+    python query_diagnostics.py --show    # print the latest stored plans
+
+benchmarks/bench_query_plans.py compares captures against a recorded baseline.
+"""
+import glob
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.pool import NullPool
+from load_metadata import current_data_version
+from config_cloud import *
+
+# ======================================================
+# Plan capture (opt-in for report runs)
+# ======================================================
+QUERY_DIAGNOSTICS = os.environ.get("CMCONNECT_QUERY_DIAGNOSTICS") == "1"
+PLAN_DIR = os.path.join(PROCESSED_PATH, "query_plans")
+KEEP_PLAN_VERSIONS = 10
+SQL_FILES = sorted(glob.glob(os.path.join(BASE_DIR, "Sqlqueries", "*.sql")))
+
+# A query counts as slower when it takes both this much longer and this many ms more
+TIME_TOLERANCE = 0.5
+MIN_SLOWDOWN_MS = 5.0
+
+_lock = threading.Lock()
+
+
+def _pg_lines(node, depth=0):
+    """EXPLAIN (FORMAT JSON) node -> indented text lines, like the default text format."""
+    label = node["Node Type"]
+    if node.get("Index Name"):
+        label += f" using {node['Index Name']}"
+    if node.get("Relation Name"):
+        label += f" on {node['Relation Name']}"
+        if node.get("Alias") and node["Alias"] != node["Relation Name"]:
+            label += f" {node['Alias']}"
+    if "Actual Total Time" in node:
+        detail = (f"(actual time={node['Actual Total Time']} ms rows={node.get('Actual Rows')} "
+                  f"loops={node.get('Actual Loops')})")
+    else:
+        detail = f"(cost={node.get('Total Cost')} rows={node.get('Plan Rows')})"
+    if node.get("Shared Hit Blocks") or node.get("Shared Read Blocks"):
+        detail += f" buffers: hit={node.get('Shared Hit Blocks', 0)} read={node.get('Shared Read Blocks', 0)}"
+    lines = ["  " * depth + ("-> " if depth else "") + f"{label}  {detail}"]
+    for child in node.get("Plans", []):
+        lines += _pg_lines(child, depth + 1)
+    return lines
+
+
+def _pg_scans(node):
+    """Table access nodes of a PostgreSQL plan, e.g. "Index Scan on staging_grievance using ix_..."."""
+    scans = []
+    if node.get("Relation Name"):
+        scan = f"{node['Node Type']} on {node['Relation Name']}"
+        scans.append(scan + (f" using {node['Index Name']}" if node.get("Index Name") else ""))
+    elif node.get("Index Name"):
+        # Bitmap Index Scan: the heap scan above it names the table
+        scans.append(f"{node['Node Type']} using {node['Index Name']}")
+    for child in node.get("Plans", []):
+        scans += _pg_scans(child)
+    return scans
+
+
+def _plan_connection(con):
+    """
+    Connection to explain on. SQLite's statement cache can keep showing the plan
+    from before a load swapped tables or indexes, so a file database gets a
+    fresh, unpooled connection (an in-memory one lives only in its pooled connection).
+    """
+    if con.dialect.name != "sqlite" or con.url.database in (None, "", ":memory:"):
+        return con.connect()
+    return create_engine(con.url, poolclass=NullPool).connect()
+
+
+def explain(sql_query, con=engine, params=None, timed=True):
+    """
+    Plan and timing of one SELECT: {"plan": text, "scans": [...], "execution_ms", "rows"}.
+
+    PostgreSQL runs EXPLAIN (ANALYZE, BUFFERS), MySQL EXPLAIN ANALYZE; other
+    databases (SQLite) give EXPLAIN QUERY PLAN and the query is run and timed,
+    its rows counted and discarded. With `timed=False` nothing is executed:
+    plain EXPLAIN, and "execution_ms" and "rows" are None.
+    """
+    statement = sql_query.strip().rstrip(";")
+    dialect = con.dialect.name
+    with _plan_connection(con) as conn:
+        if dialect == "postgresql":
+            options = "ANALYZE, BUFFERS, FORMAT JSON" if timed else "FORMAT JSON"
+            raw = conn.execute(text(f"EXPLAIN ({options}) {statement}"), params or {}).scalar()
+            root = (raw if isinstance(raw, list) else json.loads(raw))[0]
+            return {
+                "plan": "\n".join(_pg_lines(root["Plan"])),
+                "scans": _pg_scans(root["Plan"]),
+                "execution_ms": round(root["Execution Time"], 2) if "Execution Time" in root else None,
+                "planning_ms": round(root["Planning Time"], 2) if "Planning Time" in root else None,
+                "rows": root["Plan"].get("Actual Rows"),
+            }
+
+        if dialect == "mysql":
+            plan = conn.execute(text(f"EXPLAIN {'ANALYZE' if timed else 'FORMAT=TREE'} {statement}"),
+                                params or {}).scalar()
+            top = re.search(r"actual time=[\d.]+\.\.([\d.]+) rows=(\d+)", plan)
+            scans = re.findall(r"((?:Table scan|Index lookup|Index range scan|Index scan|Covering index lookup|"
+                               r"Single-row index lookup) on \S+(?: using \S+)?)", plan)
+            return {
+                "plan": plan,
+                "scans": scans,
+                "execution_ms": float(top.group(1)) if top else None,
+                "rows": int(top.group(2)) if top else None,
+            }
+
+        rows = conn.execute(text(f"EXPLAIN QUERY PLAN {statement}"), params or {}).fetchall()
+        depth = {0: -1}
+        lines = []
+        for node_id, parent, _, detail in rows:
+            depth[node_id] = depth.get(parent, -1) + 1
+            lines.append("  " * depth[node_id] + detail)
+        execution_ms = count = None
+        if timed:
+            t0 = time.perf_counter()
+            count = 0
+            for _ in conn.execute(text(statement), params or {}):
+                count += 1
+            execution_ms = round((time.perf_counter() - t0) * 1000, 2)
+        return {
+            "plan": "\n".join(lines),
+            # "SEARCH sg USING INDEX ix_... (officer_id=?) LEFT-JOIN" -> without the condition
+            "scans": [re.sub(r" \((?!subquery-)[^()]*\)", "", d) for _, _, _, d in rows
+                      if d.startswith(("SCAN ", "SEARCH "))],
+            "execution_ms": execution_ms,
+            "rows": count,
+        }
+
+
+def full_scans(scans):
+    """Tables read end to end: Seq Scan (PostgreSQL), Table scan (MySQL), SCAN without an index (SQLite)."""
+    tables = set()
+    for scan in scans:
+        match = re.match(r"(?:Seq Scan|Table scan) on (\S+)", scan) or re.fullmatch(r"SCAN (\S+)", scan)
+        if match:
+            tables.add(match.group(1))
+    return tables
+
+
+def indexed_scans(scans):
+    """Tables read through an index."""
+    tables = set()
+    for scan in scans:
+        match = (re.match(r"(?:Index|Index Only|Bitmap Heap) Scan on (\S+)", scan)
+                 or re.match(r"(?:Index lookup|Index range scan|Index scan|Covering index lookup|"
+                             r"Single-row index lookup) on (\S+)", scan)
+                 or re.match(r"(?:SEARCH|SCAN) (\S+) USING", scan))
+        if match:
+            tables.add(match.group(1))
+    return tables
+
+
+def capture_plans(con=engine, filters=None, paths=SQL_FILES):
+    """Explain every SQL file in `paths` with `filters` bound; returns {label: explain() result or {"error"}}."""
+    from analytics import portable_sql
+    from report_filters import bound_params, describe_filters
+
+    suffix = describe_filters(filters)
+    params = bound_params(filters)
+    results = {}
+    for path in paths:
+        label = os.path.basename(path) + (f" [{suffix}]" if suffix else "")
+        with open(path) as f:
+            sql_query = portable_sql(f.read(), con)
+        try:
+            results[label] = explain(sql_query, con, params)
+            logging.info(f"🔍 {label}: {results[label]['execution_ms']} ms, scans: {results[label]['scans']}")
+        except SQLAlchemyError as e:
+            # the summary-table files fail until a load has built the tables
+            results[label] = {"error": str(getattr(e, "orig", e) or e).splitlines()[0]}
+            logging.warning(f"⚠️ {label}: EXPLAIN failed ({results[label]['error']})")
+    return results
+
+
+# ======================================================
+# Stored plans, one JSON file per data version
+# ======================================================
+def plan_versions():
+    """Data versions with stored plans, oldest first."""
+    if not os.path.isdir(PLAN_DIR):
+        return []
+    return sorted(name[:-5] for name in os.listdir(PLAN_DIR) if name.endswith(".json"))
+
+
+def read_plans(version=None):
+    """Stored plans of `version` (default: the latest); {} when there are none."""
+    version = version or (plan_versions() or [None])[-1]
+    if not version:
+        return {}
+    try:
+        with open(os.path.join(PLAN_DIR, f"{version}.json")) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def store_plans(results, con=engine, data_version=None):
+    """Merge `results` ({label: explain() result}) into the plans stored for the data version."""
+    data_version = data_version or current_data_version() or "unversioned"
+    captured_at = datetime.now().isoformat(timespec="seconds")
+    with _lock:
+        os.makedirs(PLAN_DIR, exist_ok=True)
+        stored = read_plans(data_version) or {"data_version": data_version, "dialect": con.dialect.name, "queries": {}}
+        for label, result in results.items():
+            stored["queries"][label] = {**result, "captured_at": captured_at}
+        path = os.path.join(PLAN_DIR, f"{data_version}.json")
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(stored, f, indent=1)
+        os.replace(tmp_path, path)
+        for version in plan_versions()[:-KEEP_PLAN_VERSIONS]:
+            os.remove(os.path.join(PLAN_DIR, f"{version}.json"))
+    return stored
+
+
+def record_plan(report, sql_query, con=engine, params=None, filters=None, timed=True):
+    """Explain a report query about to run (CMCONNECT_QUERY_DIAGNOSTICS=1); never fails the report."""
+    from report_filters import describe_filters
+
+    label = f"{report} report" + (f" [{describe_filters(filters)}]" if describe_filters(filters) else "")
+    try:
+        result = explain(sql_query, con, params, timed)
+        store_plans({label: result}, con)
+        logging.info(f"🔍 {label}: {result['execution_ms']} ms, {result['rows']} rows, scans: {result['scans']}\n"
+                     f"{result['plan']}")
+    except Exception as e:
+        logging.warning(f"⚠️ Query diagnostics for {label} failed: {e}")
+
+
+# ======================================================
+# Plan and timing regressions
+# ======================================================
+def plan_regressions(baseline, current, tolerance=TIME_TOLERANCE, min_ms=MIN_SLOWDOWN_MS):
+    """
+    Human readable differences of `current` against `baseline` (both {label: explain() result}):
+    tables now read end to end that the baseline read through an index, other
+    plan changes, queries that started failing and slowdowns beyond `tolerance`
+    (timings are not compared when `tolerance` is None).
+    """
+    found = []
+    for label, now in current.items():
+        before = baseline.get(label)
+        if not before or "error" in before:
+            continue
+        if "error" in now:
+            found.append(f"{label}: fails now ({now['error']})")
+            continue
+        lost = (indexed_scans(before["scans"]) & full_scans(now["scans"])) - full_scans(before["scans"])
+        for table in sorted(lost):
+            found.append(f"{label}: full scan of {table} where the baseline used an index")
+        if not lost and sorted(before["scans"]) != sorted(now["scans"]):
+            found.append(f"{label}: plan changed: {before['scans']} -> {now['scans']}")
+        old, new = before.get("execution_ms"), now.get("execution_ms")
+        if tolerance is not None and old and new is not None and new - old > min_ms and (new - old) / old > tolerance:
+            found.append(f"{label}: {old} ms -> {new} ms ({(new - old) / old:+.0%})")
+    return found
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    if "--show" in sys.argv:
+        stored = read_plans()
+        for label, result in stored.get("queries", {}).items():
+            print(f"== {label}: {result.get('execution_ms')} ms, {result.get('rows')} rows")
+            print(result.get("plan") or result.get("error"))
+        sys.exit(0)
+    stored = store_plans(capture_plans())
+    print(f"Plans of {len(stored['queries'])} queries stored for data version {stored['data_version']}")
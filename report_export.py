@@ -0,0 +1,132 @@
+"""
+CSV and Excel exports of both reports, for analysts who post-process the numbers.
+
+Rows come from analytics.stream_report (a server-side cursor, chunk by chunk)
+and are written as they arrive: CSV straight to the file, Excel through
+openpyxl's write-only mode. Memory stays flat and a large result exports in
+seconds. The header row carries the colours of the report's PDF table.
+
+    python report_export.py nodal_officer xlsx
+"""
+import os
+import sys
+import logging
+import uuid
+from datetime import datetime
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill
+from openpyxl.utils import get_column_letter
+from analytics import stream_report
+from jobs import no_progress
+from load_metadata import current_data_version
+from metrics import instrumented, stage
+from report_filters import describe_filters, filter_key, filter_slug
+from report_store import EXPORT_FORMATS, EXPORT_PREFIXES, register_report
+from config_cloud import *
+
+# report -> (summary-table SQL, raw-table SQL, sheet title, header fill of its PDF table)
+EXPORTS = {
+    "nodal_officer": (SQL_SUMMARY_PATH1, SQL_QUERY_PATH1, "Nodal Officer Summary", "FFE699"),
+    "pending_summary": (SQL_SUMMARY_PATH2, SQL_QUERY_PATH2, "Pending Summary", "00665F"),
+}
+FILE_PREFIXES = {report: prefix for prefix, report in EXPORT_PREFIXES.items()}
+HEADER_TEXT_COLOR = "F5F5F5"  # whitesmoke, as in the PDF tables
+MAX_COLUMN_WIDTH = 60
+
+
+def write_csv(chunks, path, progress=no_progress):
+    """Append every chunk to a CSV file; returns the number of rows written."""
+    rows = 0
+    header = True
+    # the BOM makes Excel read the file as UTF-8 (names, "—")
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        for chunk in chunks:
+            chunk.to_csv(f, header=header, index=False)
+            header = False
+            rows += len(chunk)
+            progress(None, f"Exporting: {rows:,} rows written")
+    return rows
+
+
+def write_xlsx(chunks, path, sheet_title, header_fill, progress=no_progress, title=None):
+    """Stream every chunk into a write-only workbook; returns the number of rows written."""
+    workbook = Workbook(write_only=True)
+    workbook.properties.title = title or sheet_title
+    sheet = workbook.create_sheet(sheet_title)
+    sheet.freeze_panes = "A2"
+    rows = 0
+    columns = None
+    for chunk in chunks:
+        if columns is None:
+            # column widths and the header have to precede the first data row
+            columns = list(chunk.columns)
+            for i, col in enumerate(columns, 1):
+                longest = chunk[col].astype(str).str.len().max() if len(chunk) else 0
+                sheet.column_dimensions[get_column_letter(i)].width = min(max(len(str(col)), longest) + 2,
+                                                                          MAX_COLUMN_WIDTH)
+            header = []
+            for col in columns:
+                cell = WriteOnlyCell(sheet, value=str(col))
+                cell.font = Font(bold=True, color=HEADER_TEXT_COLOR)
+                cell.fill = PatternFill("solid", fgColor=header_fill)
+                header.append(cell)
+            sheet.append(header)
+        for row in chunk.astype(object).where(chunk.notna(), None).itertuples(index=False, name=None):
+            sheet.append(row)
+        rows += len(chunk)
+        progress(None, f"Exporting: {rows:,} rows written")
+    if columns:
+        sheet.auto_filter.ref = f"A1:{get_column_letter(len(columns))}{rows + 1}"
+    workbook.save(path)
+    return rows
+
+
+@instrumented("report_export")
+def export_report(report, fmt="xlsx", source="auto", progress=no_progress, filters=None):
+    """
+    Write the rows of `report` ("nodal_officer" or "pending_summary") as "csv"
+    or "xlsx"; returns the file path (None if nothing was written). `source`
+    and `filters` work as for the PDF generators.
+    """
+    try:
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format: {fmt}")
+        logging.info(f"===== {report} {fmt} export started =====")
+        data_version = current_data_version()
+        summary_sql_path, sql_path, sheet_title, header_fill = EXPORTS[report]
+        title = f"{sheet_title} ({describe_filters(filters)})" if describe_filters(filters) else sheet_title
+
+        slug = filter_slug(filters)
+        # the suffix keeps exports written within the same second apart
+        timestamp = f"{datetime.now():%Y%m%d_%H%M%S}_{uuid.uuid4().hex[:6]}"
+        path = os.path.join(REPORT_PATH, f"{FILE_PREFIXES[report]}{slug + '_' if slug else ''}{timestamp}.{fmt}")
+
+        progress(0.05, "Running SQL query...")
+        chunks = stream_report(report, summary_sql_path, sql_path, source=source, filters=filters)
+        with stage(f"write_{fmt}") as record:
+            if fmt == "csv":
+                rows = write_csv(chunks, path, progress)
+            else:
+                rows = write_xlsx(chunks, path, sheet_title, header_fill, progress, title)
+            record["rows"] = rows
+
+        if not rows:
+            logging.warning("Query returned no data. Export skipped.")
+            if os.path.exists(path):
+                os.remove(path)
+            return None
+
+        register_report(path, f"{report}_{fmt}", data_version, filter_key(filters))
+        logging.info(f"✅ Export written: {path} ({rows} rows)")
+        progress(1.0, f"Exported {rows:,} rows")
+        return path
+
+    except Exception as e:
+        logging.error(f"❌ Error during export: {str(e)}", exc_info=True)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    print(export_report(sys.argv[1] if len(sys.argv) > 1 else "nodal_officer",
+                        sys.argv[2] if len(sys.argv) > 2 else "xlsx"))
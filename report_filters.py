@@ -0,0 +1,76 @@
+import re
+from datetime import date, timedelta
+
+# ======================================================
+# Report filters, bound into the report SQL as parameters
+# ======================================================
+TOP_OFFICERS = 20
+# Filters that narrow the grievances a report covers (top_n only trims the Pending Summary)
+FILTERS = ("district", "department", "date_from", "date_to")
+
+
+def as_date(value):
+    if value is None or isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def report_filters(district=None, department=None, date_from=None, date_to=None, top_n=TOP_OFFICERS):
+    """Canonical filter set; None (or "") means no filter, date_to is inclusive."""
+    return {
+        "district": district or None,
+        "department": department or None,
+        "date_from": as_date(date_from),
+        "date_to": as_date(date_to),
+        "top_n": int(top_n),
+    }
+
+
+def is_filtered(filters):
+    """True when the report covers only part of the grievances (the summary tables cannot answer it)."""
+    filters = report_filters(**(filters or {}))
+    return any(filters[name] is not None for name in FILTERS)
+
+
+def bound_params(filters):
+    """
+    Parameters for the report SQL files. The date range becomes
+    date_from <= date_of_complaint < date_before, with ISO date strings that
+    compare the same way on PostgreSQL timestamps and SQLite text.
+    """
+    filters = report_filters(**(filters or {}))
+    return {
+        "district": filters["district"],
+        "department": filters["department"],
+        "date_from": filters["date_from"].isoformat() if filters["date_from"] else None,
+        "date_before": (filters["date_to"] + timedelta(days=1)).isoformat() if filters["date_to"] else None,
+        "top_n": filters["top_n"],
+    }
+
+
+def filter_key(filters):
+    """The filters that differ from the full report, as strings; {} for the full report."""
+    filters = report_filters(**(filters or {}))
+    defaults = report_filters()
+    return {name: str(value) for name, value in filters.items() if value != defaults[name]}
+
+
+def describe_filters(filters):
+    """One line for report titles, e.g. "District: Jaipur · 2024-01-01 to 2024-03-31"; "" for the full report."""
+    filters = report_filters(**(filters or {}))
+    parts = []
+    if filters["district"]:
+        parts.append(f"District: {filters['district']}")
+    if filters["department"]:
+        parts.append(f"Department: {filters['department']}")
+    if filters["date_from"] or filters["date_to"]:
+        parts.append(f"{filters['date_from'] or 'start'} to {filters['date_to'] or 'today'}")
+    if filters["top_n"] != TOP_OFFICERS:
+        parts.append(f"Top {filters['top_n']} officers")
+    return " · ".join(parts)
+
+
+def filter_slug(filters, max_length=60):
+    """File-name part for a filtered report ("" for the full report)."""
+    slug = re.sub(r"[^\w\-]+", "_", "_".join(filter_key(filters).values())).strip("_")
+    return slug[:max_length]
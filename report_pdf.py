@@ -1,18 +1,23 @@
 import os
-import math
+import re
+import itertools
+import zipfile
+import uuid
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
-from sqlalchemy import text
-from reportlab.lib import colors
 from reportlab.lib.pagesizes import A3, landscape
-from reportlab.platypus import (
-    SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, KeepTogether, PageBreak
-)
-from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.lib.enums import TA_CENTER, TA_LEFT
+from reportlab.platypus import SimpleDocTemplate, Table, Paragraph, Spacer, KeepTogether
 from datetime import datetime
+from xml.sax.saxutils import escape
 import logging
+from analytics import fetch_report, stream_report
+from jobs import no_progress, render_progress
+from metrics import instrumented, stage
+from load_metadata import current_data_version
+from pdf_stream import CompressingCanvas, LazyFlowables
+from report_filters import describe_filters, filter_key, filter_slug
+from report_store import register_report
+from report_styles import PENDING_SUMMARY_TABLE_STYLE, get_styles, register_fonts
 from config_cloud import *
 
 # ======================================================
@@ -34,150 +39,278 @@ def chunk_rows(rows, max_rows):
         chunk = [header] + body[i:i + max_rows]
         yield chunk
 
-def generate_pdf2_from_sql():
-    try:
-        logging.info("===== PDF Report Generation Started =====")
+# ======================================================
+# Page layout
+# ======================================================
+PAGE_SIZE = landscape(A3)
+MARGIN = 36  # points
+# Estimate rows that comfortably fit on a page: conservatively 35 rows for A3 landscape
+MAX_ROWS_PER_CHUNK = 40
+# Worker processes for per-officer bursting (None = one per core)
+BURST_WORKERS = None
+# Streamed rows arrive in officer order so each officer's rows are contiguous
+STREAM_SORT = [("User", True), ("Pending Grievances", False)]
+
+
+def new_document(pdf_filename):
+    return SimpleDocTemplate(pdf_filename, pagesize=PAGE_SIZE,
+                             leftMargin=MARGIN, rightMargin=MARGIN,
+                             topMargin=MARGIN, bottomMargin=MARGIN)
+
+
+def title_block(title, styles, subtitle=""):
+    elements = [
+        Paragraph(title, styles["CandaraTitle"]),
+        Spacer(1, 8),
+        Paragraph(f"Report Generated on: {datetime.now().strftime('%d-%m-%Y %H:%M:%S')}", styles["CandaraNormalLeft"]),
+    ]
+    if subtitle:
+        elements.append(Paragraph(escape(subtitle), styles["CandaraNormalLeft"]))
+    elements.append(Spacer(1, 12))
+    return elements
+
+
+def column_widths():
+    # Two columns: Category (70%) and Pending Grievances (30%) - adjust if needed
+    usable_width = PAGE_SIZE[0] - 2 * MARGIN
+    return [usable_width * 0.72, usable_width * 0.28]
+
+
+def officer_groups(df):
+    """(officer name, total pending, [(category, pending), ...]) per officer."""
+    groups = []
+    for (user, total), group in df.groupby(["User", "Total Pending (All Categories)"], dropna=False):
+        officer_name = user if pd.notna(user) else "Unknown Officer"
+        total_pending = int(total) if pd.notna(total) else 0
+        sub_df = group[["Category", "Pending Grievances"]].fillna("")
+        rows = list(zip(sub_df["Category"].astype(str), sub_df["Pending Grievances"].astype(str)))
+        groups.append((officer_name, total_pending, rows))
+    return groups
+
+
+def streamed_officer_groups(chunks, counter):
+    """officer_groups() over a chunked result sorted by officer; one officer's rows may span chunks."""
+    def rows():
+        for chunk in chunks:
+            counter["rows"] += len(chunk)
+            columns = chunk[["User", "Total Pending (All Categories)", "Category", "Pending Grievances"]]
+            yield from columns.itertuples(index=False, name=None)
+
+    for (user, total), group in itertools.groupby(rows(), key=lambda row: row[:2]):
+        officer_name = user if pd.notna(user) else "Unknown Officer"
+        total_pending = int(total) if pd.notna(total) else 0
+        yield officer_name, total_pending, [
+            ("" if pd.isna(category) else str(category), "" if pd.isna(pending) else str(pending))
+            for _, _, category, pending in group
+        ]
+
+
+def officer_section(officer_name, total_pending, rows, styles, col_widths):
+    """Flowables for one officer: header line kept with the first (chunked) table."""
+    elements = []
+
+    # Officer header line (kept with following table)
+    officer_header = Paragraph(
+        f"<b>Officer:</b> {officer_name} &nbsp;&nbsp;&nbsp;&nbsp; <b>Total Pending:</b> {total_pending}",
+        styles["CandaraHeader"]
+    )
+
+    # Build table data (header + rows)
+    table_data = [
+        [Paragraph("<b>Category</b>", styles["CandaraHeader"]),
+         Paragraph("<b>Pending Grievances</b>", styles["CandaraHeader"])]
+    ]
+    for category, pending in rows:
+        table_data.append([
+            Paragraph(category, styles["CandaraNormalLeft"]),
+            Paragraph(pending, styles["CandaraNormalLeft"])
+        ])
+
+    # Short tables stay one block; large ones break into chunks that each have the header row
+    # (-1 because chunk_rows adds header)
+    for i, chunk in enumerate(chunk_rows(table_data, MAX_ROWS_PER_CHUNK - 1)):
+        tbl = Table(chunk, colWidths=col_widths, repeatRows=1, hAlign='LEFT')
+        tbl.setStyle(PENDING_SUMMARY_TABLE_STYLE)
+
+        # For the first chunk keep it with the officer header
+        if i == 0:
+            elements.append(KeepTogether([officer_header, Spacer(1, 6), tbl, Spacer(1, 12)]))
+        else:
+            elements.append(tbl)
+            elements.append(Spacer(1, 12))
+    return elements
+
+
+def safe_filename(name):
+    return re.sub(r"[^\w\-]+", "_", str(name)).strip("_") or "Unknown_Officer"
 
-        # Step 1: Read SQL Query
-        logging.info(f"Reading SQL query from: {SQL_QUERY_PATH2}")
-        if not os.path.exists(SQL_QUERY_PATH2):
-            raise FileNotFoundError(f"SQL file not found at path: {SQL_QUERY_PATH2}")
 
-        with open(SQL_QUERY_PATH2, 'r') as file:
-            sql_query = file.read().strip()
+def unique_filenames(names):
+    """safe_filename() of every name; names that clean up the same ("A. Kumar", "A Kumar") get _2, _3, ..."""
+    taken = set()
+    filenames = []
+    for name in names:
+        base = filename = safe_filename(name)
+        n = 1
+        # compared case-insensitively: "A_Kumar" and "a_kumar" are one file on Windows and macOS
+        while filename.lower() in taken:
+            n += 1
+            filename = f"{base}_{n}"
+        taken.add(filename.lower())
+        filenames.append(filename)
+    return filenames
 
-        if not sql_query:
-            raise ValueError("SQL file is empty. Please add a valid query.")
 
-        # Step 2: Execute Query
-        logging.info("Connecting to database and executing SQL query...")
-        with engine.connect() as connection:
-            df = pd.read_sql(text(sql_query), connection)
+def render_officer_pdf(task):
+    """Process-pool worker: render one officer's section into its own PDF."""
+    officer_name, total_pending, rows, pdf_filename = task
+    register_fonts()
+    styles = get_styles()
+    elements = title_block(f"Pending Summary Report — {officer_name}", styles)
+    elements.extend(officer_section(officer_name, total_pending, rows, styles, column_widths()))
+    new_document(pdf_filename).build(elements)
+    return pdf_filename
 
-        logging.info(f"SQL query executed successfully. Rows fetched: {len(df)}")
+
+def burst_officer_pdfs(groups, out_dir, workers=None):
+    """Render every officer group into its own PDF across a process pool; returns the paths."""
+    os.makedirs(out_dir, exist_ok=True)
+    groups = list(groups)
+    filenames = unique_filenames(officer_name for officer_name, _, _ in groups)
+    tasks = [
+        (officer_name, total_pending, rows, os.path.join(out_dir, f"{filename}.pdf"))
+        for (officer_name, total_pending, rows), filename in zip(groups, filenames)
+    ]
+    workers = workers or BURST_WORKERS or os.cpu_count() or 1
+    if workers == 1 or len(tasks) == 1:
+        return [render_officer_pdf(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+        return list(pool.map(render_officer_pdf, tasks))
+
+
+def zip_reports(paths, zip_filename):
+    # PDFs are already compressed; store them as-is
+    with zipfile.ZipFile(zip_filename, "w", compression=zipfile.ZIP_STORED) as bundle:
+        for path in paths:
+            bundle.write(path, arcname=os.path.basename(path))
+    return zip_filename
+
+
+@instrumented("report_pending_summary")
+def generate_pdf2_from_sql(burst=False, combined=True, workers=None, source="auto", stream=False,
+                           progress=no_progress, filters=None):
+    """
+    Build the Pending Summary report.
+
+    With `burst=True` every officer also gets a separate PDF (rendered in a
+    process pool of `workers`, default one per core) bundled into a zip; set
+    `combined=False` to skip the single combined document. `source` is passed
+    to analytics.fetch_report ("auto", "database" or "snapshot"); `filters`
+    (district, department, date range, top_n; see report_filters) are bound
+    into the SQL.
+    `stream=True` reads the result in chunks and builds each officer's tables
+    only as the document reaches them (combined document only; bursting needs
+    every group up front, so it reads the whole result).
+    Returns a dict with the generated "combined", "officers" and "bundle" paths
+    (None if nothing was generated).
+    """
+    try:
+        logging.info("===== PDF Report Generation Started =====")
+        data_version = current_data_version()
+
+        # Step 1-2: Query the database (falls back to the in-process engine on the snapshot)
+        progress(0.05, "Running SQL query...")
+        stream = stream and not burst
+        with stage("sql_execution") as record:
+            if stream:
+                # only the first chunk is read here; the rest is fetched during the build
+                chunks = stream_report("pending_summary", SQL_SUMMARY_PATH2, SQL_QUERY_PATH2,
+                                       source=source, sort=STREAM_SORT, filters=filters)
+                df = next(chunks, pd.DataFrame())
+            else:
+                df = fetch_report("pending_summary", SQL_SUMMARY_PATH2, SQL_QUERY_PATH2, source=source, filters=filters)
+            record["rows"] = len(df)
+
+        logging.info(f"SQL query executed successfully. Rows fetched: {len(df)}{' (first chunk)' if stream else ''}")
         if df.empty:
             logging.warning("Query returned no data. PDF generation skipped.")
             print("⚠️ Query returned no data. Please check the SQL query or database.")
             return
 
-        # Step 3: Register Candara Font
-        candara_font_path = FONT_PATH
-        if not os.path.exists(candara_font_path):
-            raise FileNotFoundError(f"Candara font not found at: {candara_font_path}")
-        pdfmetrics.registerFont(TTFont("Candara", candara_font_path))
+        progress(0.2, f"Grouping {len(df):,} rows by officer...")
 
-        # Step 4: Prepare PDF Output Path
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        pdf_filename = os.path.join(REPORT_PATH, f"Nodal_Analytics_Report_{timestamp}.pdf")
-        logging.info(f"Generating PDF report at: {pdf_filename}")
+        # Step 3: Register Candara Font (once per process)
+        register_fonts()
+
+        slug = filter_slug(filters)
+        # the suffix keeps reports generated within the same second apart
+        timestamp = f"{datetime.now():%Y%m%d_%H%M%S}_{uuid.uuid4().hex[:6]}"
+        timestamp = f"{slug}_{timestamp}" if slug else timestamp
+        outputs = {"combined": None, "officers": [], "bundle": None}
+
+        if stream:
+            pdf_filename = os.path.join(REPORT_PATH, f"Nodal_Analytics_Report_{timestamp}.pdf")
+            logging.info(f"Streaming PDF report to: {pdf_filename}")
+            styles = get_styles()
+            col_widths = column_widths()
+            counter = {"rows": 0}
 
-        # Document and styles
-        PAGE_SIZE = landscape(A3)
-        left_margin = right_margin = top_margin = bottom_margin = 36  # points
-        doc = SimpleDocTemplate(pdf_filename, pagesize=PAGE_SIZE,
-                                leftMargin=left_margin, rightMargin=right_margin,
-                                topMargin=top_margin, bottomMargin=bottom_margin)
+            def sections():
+                groups = streamed_officer_groups(itertools.chain([df], chunks), counter)
+                for n, (officer_name, total_pending, rows) in enumerate(groups, 1):
+                    progress(None, f"Rendering PDF: officer {n:,}, {counter['rows']:,} rows streamed")
+                    yield from officer_section(officer_name, total_pending, rows, styles, col_widths)
 
-        styles = getSampleStyleSheet()
-        # Title style
-        styles.add(ParagraphStyle(name='CandaraTitle', fontName='Candara', fontSize=18, leading=22, alignment=TA_CENTER))
-        # Normal paragraph style for table cells (left aligned, wraps)
-        styles.add(ParagraphStyle(name='CandaraNormalLeft', fontName='Candara', fontSize=10, leading=12, alignment=TA_LEFT))
-        # Small bold style for headers inside cells
-        styles.add(ParagraphStyle(name='CandaraHeader', fontName='Candara', fontSize=11, leading=13, alignment=TA_LEFT))
+            elements = title_block("Nodal Officer Pending Summary Report", styles, describe_filters(filters))
+            with stage("doc_build") as record:
+                new_document(pdf_filename).build(LazyFlowables(elements, sections()), canvasmaker=CompressingCanvas)
+                record["rows"] = counter["rows"]
+            register_report(pdf_filename, "pending_summary", data_version, filter_key(filters))
+            outputs["combined"] = pdf_filename
+            logging.info(f"✅ PDF generated successfully: {pdf_filename} ({counter['rows']} rows streamed)")
+            print(f"✅ PDF generated successfully: {pdf_filename}")
+            return outputs
 
-        elements = []
+        groups = officer_groups(df)
+
+        # Step 4: One PDF per officer
+        if burst:
+            burst_dir = os.path.join(REPORT_PATH, f"Nodal_Officer_Burst_{timestamp}")
+            logging.info(f"Bursting {len(groups)} officer reports into: {burst_dir}")
+            progress(0.25, f"Rendering {len(groups)} officer PDFs in parallel...")
+            with stage("burst_render", rows=len(df)):
+                outputs["officers"] = burst_officer_pdfs(groups, burst_dir, workers)
+                outputs["bundle"] = zip_reports(outputs["officers"], f"{burst_dir}.zip")
+            register_report(outputs["bundle"], "officer_bundle", data_version, filter_key(filters))
+            logging.info(f"✅ {len(outputs['officers'])} officer PDFs generated: {outputs['bundle']}")
+
+        if not combined:
+            return outputs
+
+        # Step 5: Combined document
+        pdf_filename = os.path.join(REPORT_PATH, f"Nodal_Analytics_Report_{timestamp}.pdf")
+        logging.info(f"Generating PDF report at: {pdf_filename}")
+
+        progress(0.6 if burst else 0.3, f"Building tables for {len(groups)} officers...")
+        doc = new_document(pdf_filename)
+        styles = get_styles()
+        col_widths = column_widths()
 
         # Title block
-        elements.append(Paragraph("Nodal Officer Pending Summary Report", styles["CandaraTitle"]))
-        elements.append(Spacer(1, 8))
-        elements.append(Paragraph(f"Report Generated on: {datetime.now().strftime('%d-%m-%Y %H:%M:%S')}", styles["CandaraNormalLeft"]))
-        elements.append(Spacer(1, 12))
-
-        # Compute usable page width and sensible column widths
-        page_width, page_height = PAGE_SIZE
-        usable_width = page_width - left_margin - right_margin
-        # Two columns: Category (70%) and Pending Grievances (30%) - adjust if needed
-        col_widths = [usable_width * 0.72, usable_width * 0.28]
-
-        # Group data by officer
-        grouped = df.groupby(["User", "Total Pending (All Categories)"], dropna=False)
-
-        # We'll try to keep each officer header + first few rows together
-        # but allow splitting if very large. Set a max rows per chunk to avoid very tall tables.
-        # Estimate rows that comfortably fit on a page: conservatively 35 rows for A3 landscape
-        max_rows_per_chunk = 40
-
-        for (user, total), group in grouped:
-            officer_name = user if pd.notna(user) else "Unknown Officer"
-            total_pending = int(total) if pd.notna(total) else 0
-
-            # Officer header line (kept with following table)
-            officer_header = Paragraph(
-                f"<b>Officer:</b> {officer_name} &nbsp;&nbsp;&nbsp;&nbsp; <b>Total Pending:</b> {total_pending}",
-                styles["CandaraHeader"]
-            )
-
-            # Build table data (header + rows)
-            sub_df = group[["Category", "Pending Grievances"]].fillna("")
-            table_data = [
-                [Paragraph("<b>Category</b>", styles["CandaraHeader"]),
-                 Paragraph("<b>Pending Grievances</b>", styles["CandaraHeader"])]
-            ]
-
-            for _, row in sub_df.iterrows():
-                category = str(row.get("Category", ""))
-                pending = str(row.get("Pending Grievances", ""))
-                table_data.append([
-                    Paragraph(category, styles["CandaraNormalLeft"]),
-                    Paragraph(pending, styles["CandaraNormalLeft"])
-                ])
-
-            # If the table is short, add it as one block and keep it with header
-            if len(table_data) <= max_rows_per_chunk:
-                tbl = Table(table_data, colWidths=col_widths, repeatRows=1, hAlign='LEFT')
-                tbl.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#00665F")),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                    ('FONTNAME', (0, 0), (-1, -1), 'Candara'),
-                    ('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
-                    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.whitesmoke, colors.lightgrey]),
-                    ('LEFTPADDING', (0, 0), (-1, -1), 6),
-                    ('RIGHTPADDING', (0, 0), (-1, -1), 6),
-                    ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ]))
-                elements.append(KeepTogether([officer_header, Spacer(1, 6), tbl, Spacer(1, 12)]))
-            else:
-                # Large table: break into multiple chunks that each have header row
-                # chunk_rows yields segments with header included
-                for i, chunk in enumerate(chunk_rows(table_data, max_rows_per_chunk - 1)):  # -1 because chunk_rows adds header
-                    tbl = Table(chunk, colWidths=col_widths, repeatRows=1, hAlign='LEFT')
-                    tbl.setStyle(TableStyle([
-                        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#00665F")),
-                        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                        ('FONTNAME', (0, 0), (-1, -1), 'Candara'),
-                        ('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
-                        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.whitesmoke, colors.lightgrey]),
-                        ('LEFTPADDING', (0, 0), (-1, -1), 6),
-                        ('RIGHTPADDING', (0, 0), (-1, -1), 6),
-                        ('FONTSIZE', (0, 0), (-1, -1), 10),
-                    ]))
-
-                    # For the first chunk keep it with the officer header
-                    if i == 0:
-                        elements.append(KeepTogether([officer_header, Spacer(1, 6), tbl, Spacer(1, 12)]))
-                    else:
-                        elements.append(tbl)
-                        elements.append(Spacer(1, 12))
+        elements = title_block("Nodal Officer Pending Summary Report", styles, describe_filters(filters))
+        with stage("flowable_construction", rows=len(df)):
+            for officer_name, total_pending, rows in groups:
+                elements.extend(officer_section(officer_name, total_pending, rows, styles, col_widths))
 
         # Build PDF
-        doc.build(elements)
+        doc.setProgressCallBack(render_progress(progress, 0.7 if burst else 0.4, 1.0, len(df)))
+        with stage("doc_build", rows=len(df)):
+            doc.build(elements)
+        register_report(pdf_filename, "pending_summary", data_version, filter_key(filters))
+        outputs["combined"] = pdf_filename
         logging.info(f"✅ PDF generated successfully: {pdf_filename}")
         print(f"✅ PDF generated successfully: {pdf_filename}")
+        return outputs
 
     except Exception as e:
         logging.error(f"❌ Error during PDF generation: {str(e)}", exc_info=True)
@@ -186,4 +319,3 @@ def generate_pdf2_from_sql():
 
 if __name__ == "__main__":
     generate_pdf2_from_sql()
-
@@ -0,0 +1,166 @@
+import json
+import os
+import shutil
+import logging
+import threading
+import time
+from config_cloud import *
+
+# ======================================================
+# Index of generated reports, with retention
+# ======================================================
+MANIFEST_PATH = os.path.join(REPORT_PATH, "manifest.json")
+
+# Retention limits (0 disables one); the newest report of each type is always kept
+KEEP_REPORTS = int(os.environ.get("CMCONNECT_KEEP_REPORTS", 50))
+MAX_REPORT_AGE_DAYS = float(os.environ.get("CMCONNECT_MAX_REPORT_AGE_DAYS", 30))
+MAX_REPORTS_MB = float(os.environ.get("CMCONNECT_MAX_REPORTS_MB", 1024))
+
+# File name prefix -> report type, for reports written before the index existed
+REPORT_PREFIXES = {
+    "Nodal_Officer_Report_": "nodal_officer",
+    "Nodal_Analytics_Report_": "pending_summary",
+    "Nodal_Officer_Burst_": "officer_bundle",
+}
+PDF_REPORTS = ("nodal_officer", "pending_summary")
+# Row exports of the same reports (report_export.py): type "<report>_<format>"
+EXPORT_PREFIXES = {
+    "Nodal_Officer_Export_": "nodal_officer",
+    "Nodal_Analytics_Export_": "pending_summary",
+}
+EXPORT_FORMATS = ("csv", "xlsx")
+MIME_TYPES = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+_lock = threading.RLock()
+
+
+def report_type(file_name):
+    for prefix, report in REPORT_PREFIXES.items():
+        if file_name.startswith(prefix) and file_name.endswith((".pdf", ".zip")):
+            return report
+    extension = os.path.splitext(file_name)[1].lstrip(".")
+    for prefix, report in EXPORT_PREFIXES.items():
+        if file_name.startswith(prefix) and extension in EXPORT_FORMATS:
+            return f"{report}_{extension}"
+    return None
+
+
+def scan_reports():
+    """Manifest entries for the report files on disk (data version unknown)."""
+    entries = []
+    for file_name in os.listdir(REPORT_PATH):
+        report = report_type(file_name)
+        if report:
+            stat = os.stat(os.path.join(REPORT_PATH, file_name))
+            entries.append({"file": file_name, "report": report, "data_version": None,
+                            "size": stat.st_size, "created": stat.st_mtime})
+    return sorted(entries, key=lambda e: e["created"])
+
+
+def read_manifest():
+    """Indexed reports, oldest first; the first call after an upgrade indexes what is on disk."""
+    try:
+        with open(MANIFEST_PATH, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        pass
+    except ValueError:
+        logging.warning("⚠️ Report manifest unreadable; rebuilding it from the report folder")
+    with _lock:
+        entries = scan_reports()
+        write_manifest(entries)
+    return entries
+
+
+def write_manifest(entries):
+    tmp_path = f"{MANIFEST_PATH}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(entries, f, indent=1)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+
+def report_path(entry):
+    return os.path.join(REPORT_PATH, entry["file"])
+
+
+def remove_report(entry):
+    path = report_path(entry)
+    if os.path.exists(path):
+        os.remove(path)
+    # a burst bundle's officer PDFs sit in the folder of the same name
+    folder = os.path.splitext(path)[0]
+    if entry["report"] == "officer_bundle" and os.path.isdir(folder):
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def select_evictions(entries, keep=KEEP_REPORTS, max_age_days=MAX_REPORT_AGE_DAYS,
+                     max_mb=MAX_REPORTS_MB, now=None):
+    """Entries over the count, age or total size limit, newest reports kept first."""
+    now = now or time.time()
+    newest_of_type = set()
+    evict = []
+    kept, kept_bytes = 0, 0
+    for entry in sorted(entries, key=lambda e: e["created"], reverse=True):
+        if entry["report"] not in newest_of_type:
+            newest_of_type.add(entry["report"])
+        elif ((keep and kept >= keep)
+              or (max_age_days and now - entry["created"] > max_age_days * 86400)
+              or (max_mb and kept_bytes + entry["size"] > max_mb * 1024 * 1024)):
+            evict.append(entry)
+            continue
+        kept += 1
+        kept_bytes += entry["size"]
+    return evict
+
+
+def register_report(path, report, data_version=None, filters=None):
+    """
+    Add a freshly written report to the index and apply the retention limits;
+    returns its entry. `filters` is report_filters.filter_key() of the report
+    ({} for the full report).
+    """
+    size = os.path.getsize(path)
+    folder = os.path.splitext(path)[0]
+    if report == "officer_bundle" and os.path.isdir(folder):
+        size += sum(os.path.getsize(os.path.join(folder, f)) for f in os.listdir(folder))
+    entry = {"file": os.path.basename(path), "report": report, "data_version": data_version,
+             "filters": filters or {}, "size": size, "created": time.time()}
+    with _lock:
+        entries = [e for e in read_manifest() if e["file"] != entry["file"]] + [entry]
+        evicted = select_evictions(entries)
+        for old in evicted:
+            try:
+                remove_report(old)
+            except OSError as e:
+                logging.warning(f"⚠️ Could not remove old report {old['file']}: {e}")
+        if evicted:
+            logging.info(f"🗑️ {len(evicted)} old report(s) removed by the retention limits")
+            entries = [e for e in entries if e not in evicted]
+        write_manifest(entries)
+    return entry
+
+
+def latest_report(reports=PDF_REPORTS):
+    """Newest indexed report of the given types whose file still exists, or None."""
+    for entry in reversed(read_manifest()):
+        if entry["report"] in reports and os.path.exists(report_path(entry)):
+            return entry
+    return None
+
+
+def find_report(report, data_version, filters=None):
+    """Newest `report` rendered from `data_version` with exactly `filters` (filter_key form), or None."""
+    for entry in reversed(read_manifest()):
+        if (entry["report"] == report and entry["data_version"] == data_version
+                and entry.get("filters", {}) == (filters or {}) and os.path.exists(report_path(entry))):
+            return entry
+    return None
+
+
+def exported_report(report, fmt, data_version, filters=None):
+    """Path of a `fmt` export of `report` written from `data_version` with `filters` (filter_key form), or None."""
+    entry = data_version and find_report(f"{report}_{fmt}", data_version, filters)
+    return report_path(entry) if entry else None
@@ -0,0 +1,106 @@
+import os
+import threading
+from functools import lru_cache
+
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_LEFT
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.fonts import addMapping
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import TableStyle
+from config_cloud import *
+
+# ======================================================
+# Fonts: Candara family, registered once per process
+# ======================================================
+FONT_DIR = os.path.dirname(FONT_PATH)
+
+# Registered name -> (file in FONT_DIR, bold, italic)
+CANDARA_FAMILY = {
+    "Candara": (os.path.basename(FONT_PATH), 0, 0),
+    "Candara-Bold": ("Candarab.ttf", 1, 0),
+    "Candara-Italic": ("Candarai.ttf", 0, 1),
+    "Candara-BoldItalic": ("Candaraz.ttf", 1, 1),
+}
+
+_font_lock = threading.Lock()
+_fonts_registered = False
+
+
+def register_fonts():
+    """Parse and register the Candara TTFs the first time a report needs them."""
+    global _fonts_registered
+    if _fonts_registered:
+        return
+    with _font_lock:
+        if _fonts_registered:
+            return
+        if not os.path.exists(FONT_PATH):
+            raise FileNotFoundError(f"Candara font not found at: {FONT_PATH}")
+
+        for name, (filename, bold, italic) in CANDARA_FAMILY.items():
+            path = os.path.join(FONT_DIR, filename)
+            if os.path.exists(path):
+                pdfmetrics.registerFont(TTFont(name, path))
+                addMapping("Candara", bold, italic, name)
+            else:
+                # a missing variant falls back to the regular face for <b>/<i>
+                addMapping("Candara", bold, italic, "Candara")
+        _fonts_registered = True
+
+
+# ======================================================
+# Paragraph and table styles shared by both generators
+# ======================================================
+@lru_cache(maxsize=None)
+def get_styles():
+    styles = getSampleStyleSheet()
+    # Titles and header line
+    styles.add(ParagraphStyle(name='CandaraTitle', fontName='Candara', fontSize=18, leading=22, alignment=TA_CENTER))
+    styles.add(ParagraphStyle(name='CandaraNormal', fontName='Candara', fontSize=11, leading=14))
+    # Normal paragraph style for table cells (left aligned, wraps)
+    styles.add(ParagraphStyle(name='CandaraNormalLeft', fontName='Candara', fontSize=10, leading=12, alignment=TA_LEFT))
+    # Small bold style for headers inside cells
+    styles.add(ParagraphStyle(name='CandaraHeader', fontName='Candara', fontSize=11, leading=13, alignment=TA_LEFT))
+    # Centered wrapping cells of the Nodal Officer table
+    styles.add(ParagraphStyle(name='WrapStyle', fontName='Candara', fontSize=10, leading=12, alignment=TA_CENTER))
+    return styles
+
+
+# Nodal Officer report (generate_pdf.py)
+NODAL_OFFICER_TABLE_STYLE = TableStyle([
+    # Base font for all
+    ('FONTNAME', (0, 0), (-1, -1), 'Candara'),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+
+    # Header row (apply color last to ensure it sticks)
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#FFE699")),
+    ('FONTSIZE', (0, 0), (-1, 0), 12),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+
+    # Grid and alternating rows
+    ('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.whitesmoke, colors.lightgrey]),
+
+    # Spacing
+    ('LEFTPADDING', (0, 0), (-1, -1), 6),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 6),
+])
+
+# Pending Summary report (report_pdf.py)
+PENDING_SUMMARY_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#00665F")),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('FONTNAME', (0, 0), (-1, -1), 'Candara'),
+    ('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.whitesmoke, colors.lightgrey]),
+    ('LEFTPADDING', (0, 0), (-1, -1), 6),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 6),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+])
@@ -0,0 +1,174 @@
+import os
+import shutil
+import logging
+import threading
+import pyarrow as pa
+import pyarrow.parquet as pq
+from config_cloud import *
+
+# ======================================================
+# Parquet snapshots of every load, versioned by data version
+# ======================================================
+SNAPSHOT_DIR = os.path.join(PROCESSED_PATH, "snapshots")
+KEEP_SNAPSHOTS = 3
+COMPRESSION = "zstd"
+
+
+def list_snapshots():
+    """Published snapshot versions, oldest first."""
+    if not os.path.isdir(SNAPSHOT_DIR):
+        return []
+    return sorted(v for v in os.listdir(SNAPSHOT_DIR) if not v.startswith("_"))
+
+
+def snapshot_path(table, version=None):
+    """Parquet file of `table` in `version` (default: the latest snapshot)."""
+    if version is None:
+        versions = list_snapshots()
+        if not versions:
+            raise FileNotFoundError("No snapshots yet; run normalization first.")
+        version = versions[-1]
+    path = os.path.join(SNAPSHOT_DIR, version, f"{table}.parquet")
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No snapshot of {table} in version {version}")
+    return path
+
+
+def load_snapshot(table, columns=None, row_groups=None, version=None):
+    """
+    Read a snapshot table into a DataFrame, memory-mapped.
+
+    `columns` limits the columns read; `row_groups` (indexes, one group per
+    normalization chunk) limits the rows.
+    """
+    parquet = pq.ParquetFile(snapshot_path(table, version), memory_map=True)
+    if row_groups is not None:
+        data = parquet.read_row_groups(row_groups, columns=columns)
+    else:
+        data = parquet.read(columns=columns)
+    return data.to_pandas()
+
+
+def prune_snapshots(keep=KEEP_SNAPSHOTS):
+    for version in list_snapshots()[:-keep]:
+        shutil.rmtree(os.path.join(SNAPSHOT_DIR, version), ignore_errors=True)
+        logging.info(f"🗑️ Snapshot {version} removed (keeping the last {keep})")
+
+
+# Categoricals: Arrow picks the index type by the number of categories (int8 up to
+# 127), and an all-NULL one gets double values, so no chunk's own type fits the next
+CATEGORY_TYPE = pa.dictionary(pa.int32(), pa.string())
+
+
+def _snapshot_field(field):
+    """Field type every chunk is stored with."""
+    if pa.types.is_dictionary(field.type):
+        return pa.field(field.name, CATEGORY_TYPE)
+    if pa.types.is_null(field.type):
+        # a column that was empty in the first chunk still has to hold text later on
+        return pa.field(field.name, pa.string())
+    return field
+
+
+def arrow_chunk(df, schema=None):
+    """DataFrame chunk -> Arrow table; mixed object columns are stored as strings, categoricals as CATEGORY_TYPE."""
+    df = df.copy()
+    for col in df.columns:
+        if df[col].dtype == object:
+            df[col] = df[col].astype("string")
+    data = pa.Table.from_pandas(df, preserve_index=False)
+    if schema is None:
+        schema = pa.schema([_snapshot_field(f) for f in data.schema], metadata=data.schema.metadata)
+    return data.cast(schema)
+
+
+class Snapshot:
+    """
+    Parquet copy of one normalization run, written chunk by chunk next to the
+    database load and published under the data version once the load succeeds.
+    A snapshot failure is logged and never fails the load itself.
+    """
+
+    def __init__(self):
+        self.pending_dir = os.path.join(SNAPSHOT_DIR, f"_pending_{os.getpid()}_{threading.get_ident()}")
+        shutil.rmtree(self.pending_dir, ignore_errors=True)
+        os.makedirs(self.pending_dir)
+        self.writers = {}
+        self.failed = False
+
+    def write(self, table, df):
+        """Append one chunk to `table` (one row group per chunk)."""
+        if self.failed:
+            return
+        try:
+            writer = self.writers.get(table)
+            data = arrow_chunk(df, writer.schema if writer else None)
+            if writer is None:
+                path = os.path.join(self.pending_dir, f"{table}.parquet")
+                writer = self.writers[table] = pq.ParquetWriter(path, data.schema, compression=COMPRESSION)
+            writer.write_table(data)
+        except Exception as e:
+            self.failed = True
+            logging.warning(f"⚠️ Snapshot of {table} abandoned: {e}")
+
+    def widen(self, table, column):
+        """Store `column` of `table` as text from now on; the row groups written so far are rewritten."""
+        writer = self.writers.get(table)
+        if self.failed or writer is None:
+            return
+        try:
+            writer.close()
+            path = os.path.join(self.pending_dir, f"{table}.parquet")
+            previous = f"{path}.before"
+            os.replace(path, previous)
+            schema = writer.schema.set(writer.schema.get_field_index(column), pa.field(column, pa.string()))
+            writer = self.writers[table] = pq.ParquetWriter(path, schema, compression=COMPRESSION)
+            with pq.ParquetFile(previous) as written:
+                for i in range(written.num_row_groups):
+                    writer.write_table(written.read_row_group(i).cast(schema))
+            os.remove(previous)
+        except Exception as e:
+            self.failed = True
+            logging.warning(f"⚠️ Snapshot of {table} abandoned: {e}")
+
+    def carry_over(self, table):
+        """Reuse `table` from the latest snapshot (the sheet was not reloaded)."""
+        try:
+            source = snapshot_path(table)
+        except FileNotFoundError:
+            logging.warning(f"⚠️ No earlier snapshot of {table} to carry over")
+            return
+        target = os.path.join(self.pending_dir, f"{table}.parquet")
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copy2(source, target)
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+        self.writers = {}
+
+    def publish(self, version):
+        """Move the finished snapshot to SNAPSHOT_DIR/<version>; returns its directory or None."""
+        try:
+            self.close()
+            if self.failed:
+                return None
+            version_dir = os.path.join(SNAPSHOT_DIR, version)
+            os.replace(self.pending_dir, version_dir)
+            logging.info(f"📦 Snapshot published: {version_dir}")
+            prune_snapshots()
+            return version_dir
+        except Exception as e:
+            logging.warning(f"⚠️ Snapshot {version} not published: {e}")
+            return None
+        finally:
+            self.discard()
+
+    def discard(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+        shutil.rmtree(self.pending_dir, ignore_errors=True)
@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+# the project modules read their data directory and database when first imported
+TEST_DIR = tempfile.mkdtemp(prefix="cmconnect_tests_")
+os.environ.setdefault("CMCONNECT_DATA_DIR", TEST_DIR)
+os.environ.setdefault("CMCONNECT_DATABASE_URL", f"sqlite:///{os.path.join(TEST_DIR, 'test.db')}")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
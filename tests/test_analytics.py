@@ -0,0 +1,94 @@
+"""The pandas reports against the SQL files, on a small staging_grievance in in-memory SQLite."""
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+from analytics import (
+    REPORT_COLUMNS, compare_reports, officer_summary, pending_summary, portable_sql, settle_ties
+)
+from dimension_tables import NAMED_GRIEVANCES_SQL
+from dimensions import Dimensions
+from normalization import clean_eps_chunk
+from report_filters import TOP_OFFICERS, bound_params
+from config_cloud import SQL_QUERY_PATH1, SQL_QUERY_PATH2
+
+TOTAL = "Total Pending (All Categories)"
+CATEGORIES = ["Water Supply ", " Roads", "Power", None]
+DEPARTMENTS = [" Health", "Education ", "PHED", None]
+
+
+def grievance_rows():
+    """
+    EPS rows: 18 officers with distinct pending counts, a NULL officer among
+    them, four officers tied for the last top-N slot and two below the cutoff.
+    Names, departments and categories come untrimmed or NULL.
+    """
+    counts = {f"Officer {i:02d}": 40 - i for i in range(1, 19)}
+    counts.update({None: 30, "Officer 19": 5, "Officer 20": 5, "Officer 21": 5, "Officer 22": 5,
+                   "Officer 23": 2, "Officer 24": 2})
+    assert len(counts) > TOP_OFFICERS
+    rows = []
+    for officer, n in counts.items():
+        for i in range(n):
+            rows.append({
+                "grievance_id": len(rows) + 1,
+                "status": "Pending",
+                # the same officer spelled with and without padding
+                "ticket_currently_pending_with": officer and (f" {officer}" if i % 2 else f"{officer} "),
+                "new_department": DEPARTMENTS[(i + len(rows)) % len(DEPARTMENTS)],
+                "new_category": CATEGORIES[i % len(CATEGORIES)],
+                "district": " East Khasi Hills",
+                "date_of_complaint": f"2024-01-{i % 28 + 1:02d}",
+            })
+    for i in range(30):
+        rows.append({**rows[i], "grievance_id": len(rows) + 1, "status": "Closed"})
+    # a grievance listed twice counts once
+    rows.append(dict(rows[0]))
+    return pd.DataFrame(rows)
+
+
+@pytest.fixture(scope="module")
+def con():
+    con = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    df = clean_eps_chunk(grievance_rows())
+    dimensions = Dimensions(con)
+    dimensions.encode(df).to_sql("staging_grievance", con, index=False)
+    dimensions.publish(con)
+    return con
+
+
+def run_reports(con):
+    with con.connect() as connection:
+        frame = pd.read_sql(text(NAMED_GRIEVANCES_SQL), connection)[REPORT_COLUMNS]
+        results = []
+        for path in (SQL_QUERY_PATH1, SQL_QUERY_PATH2):
+            with open(path) as f:
+                results.append(pd.read_sql(text(portable_sql(f.read(), con)), connection, params=bound_params(None)))
+    return frame, results[0], results[1]
+
+
+def test_sql_and_pandas_reports_agree(con):
+    frame, sql_officer, sql_pending = run_reports(con)
+    ours_officer, ours_pending = officer_summary(frame), pending_summary(frame)
+    sql_officer, ours_pending = settle_ties(frame, sql_officer, ours_officer, sql_pending, ours_pending)
+
+    assert compare_reports(sql_officer, ours_officer, ["Department Name"]) == []
+    assert compare_reports(sql_pending, ours_pending, ["User", "Category"]) == []
+    # the NULL officer took a top slot and one of the four tied officers the last
+    assert ours_pending["User"].nunique() == TOP_OFFICERS - 1
+    assert (ours_pending.drop_duplicates("User")[TOTAL] == 5).sum() == 1
+    assert ours_pending["Category"].isna().any()
+    assert ours_officer["Department Name"].isna().any()
+
+
+def test_tied_officers_keep_their_category_rows_compared(con):
+    frame, sql_officer, sql_pending = run_reports(con)
+    ours_officer, ours_pending = officer_summary(frame), pending_summary(frame)
+    tied = sql_pending.index[sql_pending[TOTAL] == 5][0]
+    sql_pending.loc[tied, "Pending Grievances"] += 1
+    _, ours_pending = settle_ties(frame, sql_officer, ours_officer, sql_pending, ours_pending)
+
+    problems = compare_reports(sql_pending, ours_pending, ["User", "Category"])
+    assert problems == [f"Pending Grievances for {sql_pending.loc[tied, ['User', 'Category']].tolist()}: "
+                        f"{sql_pending.loc[tied, 'Pending Grievances']} vs "
+                        f"{sql_pending.loc[tied, 'Pending Grievances'] - 1}"]
@@ -0,0 +1,45 @@
+"""Streaming a sheet chunk by chunk whose later rows do not fit the first chunk's column types."""
+import os
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+from sqlalchemy import text
+from config_cloud import ingest_engine
+from normalization import conform_chunk, load_sheet
+from snapshots import Snapshot, load_snapshot
+
+
+def test_values_that_do_not_fit_turn_the_column_to_text():
+    df, widened = conform_chunk(pd.DataFrame({"ref": ["12", "AB12", None], "amount": ["1.5", "2", None]}),
+                                {"ref": "numeric", "amount": "numeric"}, "crm_raw")
+    assert widened == ["ref"]
+    assert df["ref"].tolist()[:2] == ["12", "AB12"] and pd.isna(df["ref"].iloc[2])
+    assert df["amount"].tolist()[:2] == [1.5, 2.0]
+
+
+def test_load_keeps_values_after_the_first_chunk(tmp_path):
+    book = Workbook()
+    sheet = book.active
+    sheet.title = "CRM RAW"
+    sheet.append(["Grievance ID", "Reference"])
+    for i, ref in enumerate([101, 102, 103.0, "AB-104", 105, None], 1):
+        sheet.append([i, ref])
+    path = os.path.join(tmp_path, "crm.xlsx")
+    book.save(path)
+
+    snapshot = Snapshot()
+    widened = []
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = load_sheet(workbook, "CRM RAW", "crm_text_test", chunksize=2, snapshot=snapshot, widened=widened)
+    finally:
+        workbook.close()
+    assert rows == 6
+    assert widened == ["crm_text_test.reference"]
+
+    with ingest_engine.connect() as conn:
+        loaded = conn.execute(text("SELECT grievance_id, reference FROM crm_text_test ORDER BY grievance_id")).all()
+    assert [str(ref) if ref is not None else None for _, ref in loaded] == ["101", "102", "103", "AB-104", "105", None]
+
+    assert snapshot.publish("test_widened")
+    assert load_snapshot("crm_text_test", version="test_widened")["reference"].tolist()[:5] == [
+        "101", "102", "103", "AB-104", "105"]
@@ -0,0 +1,31 @@
+"""Parquet snapshots written chunk by chunk, as normalization writes them."""
+import pandas as pd
+from snapshots import Snapshot, load_snapshot
+
+
+def chunk(values, start):
+    return pd.DataFrame({
+        "grievance_id": range(start, start + len(values)),
+        "ticket_currently_pending_with": pd.Categorical(values),
+        "block": pd.Categorical([None] * len(values)),
+    })
+
+
+def test_later_chunk_with_more_categories_is_kept():
+    snapshot = Snapshot()
+    # Arrow indexes up to 127 categories with int8, more with int16
+    first = chunk([f"Officer {i}" for i in range(10)], 0)
+    later = chunk([f"Officer {i}" for i in range(300)], 10)
+    later["block"] = pd.Categorical(["Mylliem"] * len(later))
+    snapshot.write("staging_grievance", first)
+    snapshot.write("staging_grievance", later)
+    assert not snapshot.failed
+    assert snapshot.publish("test_categories")
+
+    df = load_snapshot("staging_grievance", version="test_categories")
+    assert len(df) == 310
+    assert df["ticket_currently_pending_with"].astype(object).tolist() == (
+        [f"Officer {i}" for i in range(10)] + [f"Officer {i}" for i in range(300)]
+    )
+    assert df["block"].isna().sum() == 10
+    assert isinstance(df["ticket_currently_pending_with"].dtype, pd.CategoricalDtype)